@@ -1,87 +1,191 @@
-import feedparser
+import time
+import_started = time.perf_counter()  # For --dry-start timings
+
 import re
 import os
-import tweepy
-import anthropic
-import time
 import json
+import atexit
+import functools
 import asyncio
 import random
+import signal
+import heapq
 import logging
+import argparse
 import requests
-import subprocess
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
 import platform
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from state_store import StateStore, SqliteStateStore, seen_marks_from_tweets
+from rate_limiter import RateLimiter, SlidingWindowLimiter, backoff_delay
+from batch_generation import AnthropicBatchClient, BatchReplyStage
+from reply_cache import ReplyCache
+from scheduler import AdaptiveScheduler
+from pipeline import Pipeline, Stage
+from post_queue import PostQueue
+from cookie_service import CookieRefreshService
+from rsshub_health import AUTH, CONNECTION, EMPTY, ERRORS, OK, PARSE, RATE_LIMITED, BackendHealth, classify_status
+from rsshub_pool import Backend, BackendPool, parse_backends
+from rss_parser import parse_feed_fallback, parse_rsshub_feed
+from settings import Settings
+from metrics import Registry, serve_metrics
+from log_setup import configure_logging, parse_levels
 
-# Create logs directory if it doesn't exist
-log_dir = Path("logs")
-log_dir.mkdir(exist_ok=True)
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_dir / "bot.log"),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-# Log system information
-logger.info(f"Starting bot on {platform.system()} {platform.release()}")
-logger.info(f"Python version: {platform.python_version()}")
+def setup_logging():
+    """Send logs to logs/bot.log and the console (done at startup, not on import)
 
-# Load environment variables
-load_dotenv()
-
-# Verify required environment variables
-required_env_vars = [
-    "TWITTER_API_KEY",
-    "TWITTER_API_SECRET",
-    "TWITTER_ACCESS_TOKEN",
-    "TWITTER_ACCESS_SECRET",
-    "ANTHROPIC_API_KEY",
-    "RSSHUB_URL",
-    "TWITTER_USERNAME",
-    "TWITTER_PASSWORD"
-]
+    Records are queued and written by a background thread, so a slow disk or
+    console never holds up the event loop.
+    """
+    # Create logs directory if it doesn't exist
+    log_dir = Path("logs")
+    log_dir.mkdir(exist_ok=True)
+    
+    levels = parse_levels(LOG_LEVELS)
+    if "app" in levels:
+        levels[__name__] = levels["app"]  # This module logs as __main__ when run directly
+    configure_logging(log_dir / "bot.log", LOG_LEVEL, LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUPS, levels)
+    
+    # Log system information
+    logger.info(f"Starting bot on {platform.system()} {platform.release()}")
+    logger.info(f"Python version: {platform.python_version()}")
 
-missing_vars = [var for var in required_env_vars if not os.getenv(var)]
-if missing_vars:
-    logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
-    raise SystemExit(1)
+# Load environment variables, required ones are checked when first needed
+load_dotenv()
+settings = Settings()
 
-# Create data directory for persistent files
+# Data directory for persistent files, created on first write
 data_dir = Path("data")
-data_dir.mkdir(exist_ok=True)
+
+# Logging, configured by setup_logging()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # Root log level
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # Per-module levels, "module=LEVEL, ..." ("app" is this file)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" or "json" (JSON lines)
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))  # Rotate logs/bot.log at this size, 0 never
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))  # Rotated log files kept
 
 # Update file paths to use data directory
 RATE_LIMIT_FILE = data_dir / "tweet_rate_limit.json"
 SEEN_TWEETS_FILE = data_dir / "seen_tweets.json"
 POLL_STATS_FILE = data_dir / "poll_stats.json"
 
-# Twitter Auth - using API v2
-api = tweepy.Client(
-    consumer_key=os.getenv("TWITTER_API_KEY"),
-    consumer_secret=os.getenv("TWITTER_API_SECRET"),
-    access_token=os.getenv("TWITTER_ACCESS_TOKEN"),
-    access_token_secret=os.getenv("TWITTER_ACCESS_SECRET")
-)
+# State is loaded once, served from memory and flushed to disk in the background
+STATE_FLUSH_INTERVAL = int(os.getenv("STATE_FLUSH_INTERVAL", "30"))  # Seconds between flushes
+state = StateStore(flush_interval=STATE_FLUSH_INTERVAL)
+atexit.register(state.flush)
 
-# Anthropic Auth
-client = anthropic.Anthropic(
-    api_key=os.getenv("ANTHROPIC_API_KEY")
-)
+# Optional SQLite backend ("json" keeps the data/*.json files)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+SQLITE_DB_FILE = data_dir / "twitbot.db"
+db = None
+
+def get_db():
+    """The SQLite store, opened and migrated from the JSON files on first use, None with JSON storage"""
+    global db
+    if db is None and STORAGE_BACKEND == "sqlite":
+        db = SqliteStateStore(SQLITE_DB_FILE)
+        db.migrate_from_json(RATE_LIMIT_FILE, SEEN_TWEETS_FILE, POLL_STATS_FILE)
+        atexit.register(db.close)
+        logger.info(f"💾 Using SQLite storage at {SQLITE_DB_FILE}")
+    return db
+
+# API clients are created on first use, so importing app stays fast and works offline
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "20"))  # Seconds before a reply draft is abandoned
+TWITTER_TIMEOUT = (5, 30)  # Connect / read seconds for Twitter API calls
+api = None
+client = None
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter with a default timeout, for sessions whose callers never pass one (tweepy)"""
+
+    def __init__(self, timeout, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+def get_twitter_api():
+    """Twitter API v2 client"""
+    global api
+    if api is None:
+        import tweepy
+        settings.require("TWITTER_API_KEY", "TWITTER_API_SECRET", "TWITTER_ACCESS_TOKEN", "TWITTER_ACCESS_SECRET")
+        api = tweepy.Client(
+            consumer_key=settings["TWITTER_API_KEY"],
+            consumer_secret=settings["TWITTER_API_SECRET"],
+            access_token=settings["TWITTER_ACCESS_TOKEN"],
+            access_token_secret=settings["TWITTER_ACCESS_SECRET"],
+            return_type=requests.Response  # Raw responses so the x-rate-limit-* headers can be read
+        )
+        # Without a timeout a hung post would hold its thread forever
+        api.session.mount("https://", TimeoutHTTPAdapter(TWITTER_TIMEOUT))
+    return api
+
+def get_llm_client():
+    """Anthropic client, async so LLM calls never block the event loop"""
+    global client
+    if client is None:
+        import anthropic
+        settings.require("ANTHROPIC_API_KEY")
+        client = anthropic.AsyncAnthropic(
+            api_key=settings["ANTHROPIC_API_KEY"],
+            timeout=LLM_TIMEOUT,
+            max_retries=1
+        )
+    return client
 
 # Constants
 MAX_REPLIES_PER_DAY = 16  # Maximum replies we'll make per day
 MAX_POLLS_PER_DAY = 16    # Number of polling cycles per day
-USERS_PER_CHECK = 3       # Number of users to check each time
+USERS_PER_CHECK = int(os.getenv("USERS_PER_CHECK", "3"))  # Users checked per cycle (raise it in batch mode)
 MAX_REPLIES_PER_MONTH = 500  # Rate limit for replies per month
-RSSHUB_URL = os.getenv("RSSHUB_URL")  # Use environment variable if available
+RSSHUB_URL = settings["RSSHUB_URL"]  # Use environment variable if available
+RSSHUB_URLS = os.getenv("RSSHUB_URLS") or RSSHUB_URL or ""  # Optional pool of instances, "[service=]url, ..."
+RSSHUB_BATCH_URL = os.getenv("RSSHUB_BATCH_URL")  # Optional list/multi-user route, "{users}" is replaced by handles
+FEED_BATCH_SIZE = int(os.getenv("FEED_BATCH_SIZE", "20"))  # Users per combined request in batch mode
+LIST_ROUTE = bool(RSSHUB_BATCH_URL) and "{users}" not in RSSHUB_BATCH_URL  # One request returns every list member
+# Feed requests per check cycle, what the daily poll budget counts
+if LIST_ROUTE:
+    REQUESTS_PER_CHECK = 1
+elif RSSHUB_BATCH_URL:
+    REQUESTS_PER_CHECK = -(-USERS_PER_CHECK // FEED_BATCH_SIZE)
+else:
+    REQUESTS_PER_CHECK = USERS_PER_CHECK
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "5"))  # Max feeds fetched in parallel
+USER_DELAY_MIN = 200      # Min seconds between the starts of two user fetches
+USER_DELAY_MAX = 500      # Max seconds between the starts of two user fetches
+FEED_TIMEOUT = 5          # Seconds before an RSSHub request times out
+SEEN_TWEETS_MAX_AGE_DAYS = int(os.getenv("SEEN_TWEETS_MAX_AGE_DAYS", "30"))  # Forget unmonitored users' marks after this
+SEEN_COMPACTION_INTERVAL = 6 * 60 * 60  # Seconds between seen tweets compaction passes
+FEED_PAGE_SIZE = int(os.getenv("FEED_PAGE_SIZE", "20"))  # Tweets requested per feed poll
+MAX_REPLIES_PER_POLL = int(os.getenv("MAX_REPLIES_PER_POLL", "1"))  # Best new tweets replied to per poll
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "adaptive").lower()  # "adaptive" or "random" user selection
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Serve Prometheus metrics on this port, 0 disables
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")  # Interface the metrics endpoint listens on
+
+# Prometheus-style metrics. Recording is a dict update, so they're always collected;
+# state that already exists (limits, queues, caches) is only read when scraped.
+metrics = Registry(prefix="twitbot_")
+PARSE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+rsshub_fetch_seconds = metrics.histogram("rsshub_fetch_seconds", "RSSHub feed request latency by instance and outcome",
+                                         ("backend", "outcome"))
+feed_parse_seconds = metrics.histogram("feed_parse_seconds", "Feed parse time by parser", ("parser",), PARSE_BUCKETS)
+llm_request_seconds = metrics.histogram("llm_request_seconds", "Reply draft latency by generation mode", ("mode",))
+post_seconds = metrics.histogram("post_seconds", "Twitter post request latency by outcome", ("outcome",))
+post_errors_total = metrics.counter("post_errors_total", "Failed Twitter post attempts by reason", ("reason",))
+stage_seconds = metrics.histogram("stage_seconds", "Pipeline stage handler latency", ("stage",))
+twitter_rate_limit_remaining = metrics.gauge("twitter_rate_limit_remaining",
+                                             "x-rate-limit-remaining from the last Twitter post")
 
 # Test users - replace with your full set of users to monitor
 USERS = [
@@ -112,203 +216,261 @@ def set_test_mode(enabled=True):
     logger.info(f"🧪 Test mode {'enabled' if enabled else 'disabled'}")
 
 # Rate limiting functions
-def load_rate_limit_data():
-    """Load the rate limit data from file"""
-    if os.path.exists(RATE_LIMIT_FILE):
-        try:
-            with open(RATE_LIMIT_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading rate limit data: {e}")
-    
-    # Return default data if file doesn't exist or there's an error
+def default_rate_limit_data():
+    """Default rate limit data used when the file doesn't exist or can't be read"""
     return {
-        "replies": [],           # Track actual replies made
-        "polls": [],            # Track polling cycles
-        "last_reset": datetime.now().isoformat(),
-        "monthly_replies": [],
-        "last_monthly_reset": datetime.now().isoformat()
+        "limiters": {}          # Timestamps of the most recent permits per limit
     }
 
+rate_limit_doc = state.document("rate_limit", RATE_LIMIT_FILE, default_rate_limit_data)
+
+def load_rate_limit_data():
+    """Return the in-memory rate limit data (read from file on first use)"""
+    return rate_limit_doc.data
+
 def save_rate_limit_data(data):
-    """Save the rate limit data to file"""
-    try:
-        with open(RATE_LIMIT_FILE, 'w') as f:
-            json.dump(data, f)
-    except Exception as e:
-        logger.error(f"Error saving rate limit data: {e}")
+    """Queue the rate limit data for the next background flush"""
+    rate_limit_doc.data = data
+    rate_limit_doc.mark_dirty()
 
-def can_make_reply():
-    """Check if we can make another reply today"""
-    data = load_rate_limit_data()
-    
-    # Convert timestamps from string to datetime
-    last_reset = datetime.fromisoformat(data.get("last_reset", datetime.now().isoformat()))
-    last_monthly_reset = datetime.fromisoformat(data.get("last_monthly_reset", datetime.now().isoformat()))
-    now = datetime.now()
-    
-    # If it's been more than 24 hours since the last reset, reset the counters
-    if now - last_reset > timedelta(hours=24):
-        data["replies"] = []
-        data["polls"] = []
-        data["last_reset"] = now.isoformat()
-        save_rate_limit_data(data)
+# Rolling limits: any 24 hours / 30 days, not calendar resets
+rate_limiter = RateLimiter({
+    "daily_replies": SlidingWindowLimiter(MAX_REPLIES_PER_DAY, 24 * 60 * 60),
+    "monthly_replies": SlidingWindowLimiter(MAX_REPLIES_PER_MONTH, 30 * 24 * 60 * 60),
+    "polls": SlidingWindowLimiter(MAX_POLLS_PER_DAY * REQUESTS_PER_CHECK, 24 * 60 * 60),
+})
+
+def legacy_timestamps(entries):
+    """Convert [{"timestamp": iso}, ...] lists from the old rate limit format to epoch seconds"""
+    return [datetime.fromisoformat(entry["timestamp"]).timestamp() for entry in entries]
+
+def restore_rate_limiter():
+    """Load the limiter state, converting the old list-based format if needed"""
+    if get_db() is not None:
+        saved = db.get_meta("rate_limiters")
+        if saved:
+            rate_limiter.load(json.loads(saved))
+        else:
+            now = time.time()
+            rate_limiter.load({
+                "daily_replies": db.recent_timestamps("replies", now - 24 * 60 * 60),
+                "monthly_replies": db.recent_timestamps("replies", now - 30 * 24 * 60 * 60),
+                "polls": db.recent_timestamps("polls", now - 24 * 60 * 60),
+            })
+        return
     
-    # If it's been more than a month since the last monthly reset, reset that counter
-    if now - last_monthly_reset > timedelta(days=30):
-        data["monthly_replies"] = []
-        data["last_monthly_reset"] = now.isoformat()
-        save_rate_limit_data(data)
+    data = load_rate_limit_data()
+    if "limiters" in data:
+        rate_limiter.load(data["limiters"])
+    else:
+        # Converted in memory only, the new format is written with the first poll or reply
+        rate_limiter.load({
+            "daily_replies": legacy_timestamps(data.get("replies", [])),
+            "monthly_replies": legacy_timestamps(data.get("monthly_replies", [])),
+            "polls": legacy_timestamps(data.get("polls", [])),
+        })
+
+def save_rate_limiter():
+    """Persist the limiter state"""
+    if get_db() is not None:
+        db.set_meta("rate_limiters", json.dumps(rate_limiter.state()))
+    else:
+        save_rate_limit_data({"limiters": rate_limiter.state()})
+
+
+def can_make_reply():
+    """Check if we can make another reply within the daily and monthly limits"""
+    load_state()
+    daily = rate_limiter["daily_replies"]
+    monthly = rate_limiter["monthly_replies"]
     
     # Check if we're under the daily reply limit
-    if len(data.get("replies", [])) >= MAX_REPLIES_PER_DAY:
-        logger.warning(f"⚠️ Daily reply limit reached: {len(data['replies'])}/{MAX_REPLIES_PER_DAY} replies today")
+    if not daily.can_acquire():
+        logger.warning(f"⚠️ Daily reply limit reached: {daily.used()}/{MAX_REPLIES_PER_DAY} replies in the last 24h "
+                       f"(next in {daily.time_until_available()/60:.1f} minutes)")
         return False
     
     # Check if we're under the monthly limit
-    if len(data.get("monthly_replies", [])) >= MAX_REPLIES_PER_MONTH:
-        logger.warning(f"⚠️ Monthly reply limit reached: {len(data['monthly_replies'])}/{MAX_REPLIES_PER_MONTH} replies this month")
+    if not monthly.can_acquire():
+        logger.warning(f"⚠️ Monthly reply limit reached: {monthly.used()}/{MAX_REPLIES_PER_MONTH} replies in the last 30 days "
+                       f"(next in {monthly.time_until_available()/3600:.1f} hours)")
         return False
     
     return True
 
+def time_until_next_reply():
+    """Seconds until both reply limits have a permit available"""
+    return rate_limiter.time_until_available("daily_replies", "monthly_replies")
+
 def can_poll_feed():
     """Check if we can do another polling cycle"""
-    data = load_rate_limit_data()
-    
-    # Calculate completed cycles (every 3 users = 1 cycle)
-    completed_cycles = len(data.get("polls", [])) // USERS_PER_CHECK
+    load_state()
+    polls = rate_limiter["polls"]
     
-    # Check if we're under the daily cycle limit
-    if completed_cycles >= MAX_POLLS_PER_DAY:
+    # Check if we're under the daily poll limit
+    if not polls.can_acquire():
+        completed_cycles = polls.used() // REQUESTS_PER_CHECK
         logger.warning(f"⚠️ Daily cycle limit reached: {completed_cycles}/{MAX_POLLS_PER_DAY} cycles completed")
         return False
     
     return True
 
+def time_until_next_poll():
+    """Seconds until the poll limit has a permit available"""
+    return rate_limiter.time_until_available("polls")
+
 def track_poll():
-    """Track that we completed a polling cycle"""
-    data = load_rate_limit_data()
-    
-    # Get current polls count
-    current_polls = len(data.get("polls", []))
+    """Track one feed request (a user's feed, or a group of users in batch mode)"""
+    load_state()
+    rate_limiter.consume("polls")
+    if get_db() is not None:
+        db.add_poll(datetime.now().isoformat())
+    save_rate_limiter()
     
-    # Add the new poll with timestamp
-    data.setdefault("polls", []).append({
-        "timestamp": datetime.now().isoformat()
-    })
-    
-    # Save the updated data
-    save_rate_limit_data(data)
-    
-    # Calculate completed cycles (every 3 users = 1 cycle)
-    completed_cycles = len(data.get("polls", [])) // USERS_PER_CHECK
+    # Calculate completed cycles (every REQUESTS_PER_CHECK requests = 1 cycle)
+    poll_count = rate_limiter["polls"].used()
+    completed_cycles = poll_count // REQUESTS_PER_CHECK
     remaining_cycles = MAX_POLLS_PER_DAY - completed_cycles
     
     # Only log cycle completion when we finish a full set of users
-    if len(data.get("polls", [])) % USERS_PER_CHECK == 0:
+    if poll_count % REQUESTS_PER_CHECK == 0:
         logger.info(f"📊 Poll cycle status: {completed_cycles}/{MAX_POLLS_PER_DAY} cycles completed (remaining: {remaining_cycles})")
     else:
-        users_in_current_cycle = len(data.get("polls", [])) % USERS_PER_CHECK
-        logger.info(f"📊 Current cycle progress: {users_in_current_cycle}/{USERS_PER_CHECK} users checked")
+        requests_in_current_cycle = poll_count % REQUESTS_PER_CHECK
+        logger.info(f"📊 Current cycle progress: {requests_in_current_cycle}/{REQUESTS_PER_CHECK} feed requests made")
 
 def track_reply(tweet_id):
     """Track that we made a reply"""
-    data = load_rate_limit_data()
-    
-    # Add the new reply with timestamp
-    data.setdefault("replies", []).append({
-        "id": tweet_id,
-        "timestamp": datetime.now().isoformat()
-    })
-    
-    # Add to monthly replies as well
-    data.setdefault("monthly_replies", []).append({
-        "id": tweet_id,
-        "timestamp": datetime.now().isoformat()
-    })
-    
-    # Save the updated data
-    save_rate_limit_data(data)
+    load_state()
+    rate_limiter.consume("daily_replies", "monthly_replies")
+    if get_db() is not None:
+        db.add_reply(tweet_id, datetime.now().isoformat())
+    save_rate_limiter()
     
     # Log the current rate limit status
-    daily_remaining = MAX_REPLIES_PER_DAY - len(data.get("replies", []))
-    monthly_remaining = MAX_REPLIES_PER_MONTH - len(data.get("monthly_replies", []))
-    logger.info(f"📊 Daily reply limit: {len(data.get('replies', []))}/{MAX_REPLIES_PER_DAY} (remaining: {daily_remaining})")
-    logger.info(f"📊 Monthly reply limit: {len(data.get('monthly_replies', []))}/{MAX_REPLIES_PER_MONTH} (remaining: {monthly_remaining})")
+    daily_replies = rate_limiter["daily_replies"].used()
+    monthly_replies = rate_limiter["monthly_replies"].used()
+    daily_remaining = MAX_REPLIES_PER_DAY - daily_replies
+    monthly_remaining = MAX_REPLIES_PER_MONTH - monthly_replies
+    logger.info(f"📊 Daily reply limit: {daily_replies}/{MAX_REPLIES_PER_DAY} (remaining: {daily_remaining})")
+    logger.info(f"📊 Monthly reply limit: {monthly_replies}/{MAX_REPLIES_PER_MONTH} (remaining: {monthly_remaining})")
 
-# Seen tweets tracking
-def load_seen_tweets():
-    """Load the seen tweets from file"""
-    if os.path.exists(SEEN_TWEETS_FILE):
-        try:
-            with open(SEEN_TWEETS_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading seen tweets: {e}")
-    
-    # Return default data if file doesn't exist or there's an error
+# Seen tweets tracking (one high-water mark per user, tweet IDs are monotonic)
+def default_seen_tweets():
+    """Default seen tweets data used when the file doesn't exist or can't be read"""
     return {
-        "tweets": {}
+        "marks": {}
     }
 
+seen_tweets_doc = state.document("seen_tweets", SEEN_TWEETS_FILE, default_seen_tweets)
+
+def load_seen_tweets():
+    """Return the in-memory seen tweet marks (read from file on first use)"""
+    data = seen_tweets_doc.data
+    if "tweets" in data:
+        # Migrate the legacy {"tweets": {user: {tweet_id: ...}}} layout to marks
+        data = {"marks": seen_marks_from_tweets(data["tweets"])}
+        save_seen_tweets(data)
+        logger.info(f"💾 Migrated seen tweets to high-water marks for {len(data['marks'])} users")
+    return data
+
 def save_seen_tweets(data):
-    """Save the seen tweets to file"""
-    try:
-        with open(SEEN_TWEETS_FILE, 'w') as f:
-            json.dump(data, f)
-    except Exception as e:
-        logger.error(f"Error saving seen tweets: {e}")
+    """Queue the seen tweet marks for the next background flush"""
+    seen_tweets_doc.data = data
+    seen_tweets_doc.mark_dirty()
 
 def mark_tweet_as_seen(user, tweet_id, replied=False):
     """Mark a tweet as seen, optionally with reply status"""
-    data = load_seen_tweets()
+    now = datetime.now().isoformat()
+    if get_db() is not None:
+        db.mark_tweet_as_seen(user, tweet_id, replied, now)
+        return
     
-    # Initialize user's tweets dict if not exists
-    if user not in data["tweets"]:
-        data["tweets"][user] = {}
+    data = load_seen_tweets()
+    mark = data["marks"].setdefault(user, {"last_id": tweet_id, "timestamp": now, "last_replied_id": None})
     
-    # Add the tweet
-    data["tweets"][user][tweet_id] = {
-        "timestamp": datetime.now().isoformat(),
-        "replied": replied
-    }
+    # Only ever move the mark forward
+    if int(tweet_id) > int(mark["last_id"]):
+        mark["last_id"] = tweet_id
+    mark["timestamp"] = now
+    if replied:
+        mark["last_replied_id"] = tweet_id
     
     # Save the updated data
     save_seen_tweets(data)
 
-def is_tweet_seen(user, tweet_id):
-    """Check if a tweet has been seen before"""
-    data = load_seen_tweets()
+def last_seen_id(user):
+    """Return the user's high-water mark as an int, or None if we never saw them"""
+    if get_db() is not None:
+        return db.last_seen_id(user)
     
-    return user in data["tweets"] and tweet_id in data["tweets"][user]
+    mark = load_seen_tweets()["marks"].get(user)
+    return int(mark["last_id"]) if mark else None
 
-# Poll statistics
-def load_poll_stats():
-    """Load the poll statistics from file"""
-    if os.path.exists(POLL_STATS_FILE):
+# Seen tweets retention
+seen_tweets_evicted_total = 0  # Marks evicted by compaction since startup
+
+def compact_seen_tweets(max_age_days=None, monitored_users=None):
+    """Evict marks of users no longer monitored once they are older than the retention age
+
+    Marks of monitored users are always kept, dropping one would make the
+    newest tweet in their feed look new again.
+    """
+    global seen_tweets_evicted_total
+    max_age_days = SEEN_TWEETS_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    monitored_users = set(USERS if monitored_users is None else monitored_users)
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+    
+    if get_db() is not None:
+        evicted, remaining = db.compact_seen_marks(cutoff, monitored_users)
+    else:
+        data = load_seen_tweets()
+        stale = [user for user, mark in data["marks"].items()
+                 if user not in monitored_users and mark.get("timestamp", "") < cutoff]
+        for user in stale:
+            del data["marks"][user]
+        if stale:
+            save_seen_tweets(data)
+        evicted, remaining = len(stale), len(data["marks"])
+    
+    seen_tweets_evicted_total += evicted
+    logger.info(f"🧹 Seen tweets compaction: evicted {evicted} marks, {remaining} remaining "
+                f"(max age {max_age_days}d, {seen_tweets_evicted_total} evicted since start)")
+    return evicted
+
+async def run_seen_tweets_compaction():
+    """Compact seen tweets on startup and then every SEEN_COMPACTION_INTERVAL seconds"""
+    while True:
         try:
-            with open(POLL_STATS_FILE, 'r') as f:
-                return json.load(f)
+            compact_seen_tweets()
         except Exception as e:
-            logger.error(f"Error loading poll stats: {e}")
-    
-    # Return default data if file doesn't exist or there's an error
+            logger.error(f"❌ Seen tweets compaction failed: {e}")
+        await asyncio.sleep(SEEN_COMPACTION_INTERVAL)
+
+# Poll statistics
+def default_poll_stats():
+    """Default poll statistics used when the file doesn't exist or can't be read"""
     return {
         "user_stats": {},
         "last_reset": datetime.now().isoformat()
     }
 
+poll_stats_doc = state.document("poll_stats", POLL_STATS_FILE, default_poll_stats)
+
+def load_poll_stats():
+    """Return the in-memory poll statistics (read from file on first use)"""
+    return poll_stats_doc.data
+
 def save_poll_stats(data):
-    """Save the poll statistics to file"""
-    try:
-        with open(POLL_STATS_FILE, 'w') as f:
-            json.dump(data, f)
-    except Exception as e:
-        logger.error(f"Error saving poll stats: {e}")
+    """Queue the poll statistics for the next background flush"""
+    poll_stats_doc.data = data
+    poll_stats_doc.mark_dirty()
 
 def update_user_stats(user, found_tweets, new_tweets):
     """Update statistics for a user"""
+    if get_db() is not None:
+        return db.update_user_stats(user, found_tweets, new_tweets, datetime.now())
+    
     data = load_poll_stats()
     
     # Convert last_reset from string to datetime
@@ -342,193 +504,604 @@ def update_user_stats(user, found_tweets, new_tweets):
     save_poll_stats(data)
     return data["user_stats"][user]
 
-def on_rsshub_failure():
-    """Handle RSSHub failure by refreshing cookies and redeploying"""
-    logger.warning("⚠️ RSSHub failure detected. Refreshing cookies and redeploying...")
-    try:
-        # Use the virtual environment python if available
-        python_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "venv", "bin", "python")
-        if not os.path.exists(python_path):
-            python_path = "python3"
-        
-        # Run cookie refresher and capture output
-        result = subprocess.run([python_path, "cookie_refresher.py"], 
-                              capture_output=True, 
-                              text=True)
+# Adaptive polling scheduler
+scheduler = AdaptiveScheduler(half_life=7 * 24 * 60 * 60, default_gap=BASE_INTERVAL)
+scheduler_metrics = {}  # Expected-yield summary of the latest user selection
+
+def restore_scheduler():
+    """Load scheduler history and seed users that only have poll_stats totals"""
+    if get_db() is not None:
+        scheduler.load(db.load_scheduler_stats())
+        user_stats = db.all_user_stats()
+    else:
+        data = load_poll_stats()
+        scheduler.load(data.get("scheduler", {}))
+        user_stats = data.get("user_stats", {})
+    
+    for user, stats in user_stats.items():
+        scheduler.seed(user, stats.get("new_tweets", 0), stats.get("total_polls", 0))
+
+def record_scheduler_poll(user, new_tweets):
+    """Feed a poll result back into the scheduler and persist it"""
+    load_state()
+    stats = scheduler.record_poll(user, new_tweets)
+    if get_db() is not None:
+        db.save_scheduler_stats(user, stats)
+    else:
+        data = load_poll_stats()
+        data["scheduler"] = scheduler.state()
+        save_poll_stats(data)
+
+def select_users_to_check(count):
+    """Pick the users to check next, favouring those most likely to have new tweets"""
+    load_state()
+    global scheduler_metrics
+    if SCHEDULER_MODE == "random":
+        selected = random.sample(USERS, count)
+    else:
+        selected = scheduler.select(USERS, count)
+    
+    scheduler_metrics = scheduler.metrics(USERS, selected)
+    logger.info(f"🎯 Expected new tweets this check: {scheduler_metrics['selected_expected_new']:.2f} "
+                f"(uniform pick: {scheduler_metrics['uniform_expected_new']:.2f})")
+    return selected
+
+
+COOKIE_REFRESH_COOLDOWN = int(os.getenv("COOKIE_REFRESH_COOLDOWN", str(30 * 60)))  # Seconds between cookie refreshes
+COOKIE_REFRESH_DEBOUNCE = 30   # Seconds to let a burst of failures coalesce before refreshing
+COOKIE_REFRESH_MAX_FAILURES = 3  # Failed refreshes in a row before pausing them
+COOKIE_REFRESH_PAUSE = 6 * 60 * 60  # Seconds refreshes stay paused after that
+
+def refresh_rsshub_cookies(service="rsshub"):
+    """Log in for fresh cookies and redeploy an RSSHub service (blocking, runs in a worker thread)"""
+    # Imported here so playwright only loads once cookies actually need refreshing
+    import cookie_refresher
+    ok = cookie_refresher.main(service)
+    
+    # Verify that cookie files exist
+    cookie_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "user_data")
+    if os.path.exists(cookie_file):
+        logger.info("✅ Cookie data directory exists")
+    else:
+        logger.error("❌ Cookie data directory not found")
+    return ok
+
+# One refresh service per RSSHub deployment, each instance carries its own cookies
+cookie_services = {}
+
+def cookie_service_for(service):
+    if service not in cookie_services:
+        cookie_services[service] = CookieRefreshService(
+            functools.partial(refresh_rsshub_cookies, service),
+            debounce=COOKIE_REFRESH_DEBOUNCE,
+            cooldown=COOKIE_REFRESH_COOLDOWN,
+            max_failures=COOKIE_REFRESH_MAX_FAILURES,
+            open_duration=COOKIE_REFRESH_PAUSE
+        )
+    return cookie_services[service]
+
+def bind_cookie_services():
+    for service in cookie_services.values():
+        service.bind()
+
+def on_rsshub_failure(backend, reason=""):
+    """Handle an RSSHub instance failing by refreshing its cookies and redeploying it in the background"""
+    backend.refresher.request(f"{backend.service}: {reason}")
+
+# Health of each RSSHub instance: rolling error rate and circuit breaker
+RSSHUB_ERROR_THRESHOLD = float(os.getenv("RSSHUB_ERROR_THRESHOLD", "0.5"))  # Error share that opens the circuit
+RSSHUB_HEALTH_WINDOW = 15 * 60  # Seconds of outcomes the error rate covers
+RSSHUB_CIRCUIT_OPEN = int(os.getenv("RSSHUB_CIRCUIT_OPEN", str(5 * 60)))  # Seconds polls pause once the circuit opens
+
+def make_backend(url, service):
+    health = BackendHealth(
+        window=RSSHUB_HEALTH_WINDOW,
+        error_threshold=RSSHUB_ERROR_THRESHOLD,
+        open_duration=RSSHUB_CIRCUIT_OPEN
+    )
+    return Backend(url, service, health, cookie_service_for(service))
+
+# Per-user feeds are routed over every instance in RSSHUB_URLS, batch routes over RSSHUB_BATCH_URL
+rsshub_pool = BackendPool([make_backend(url, service) for url, service in parse_backends(RSSHUB_URLS)])
+batch_pool = BackendPool([make_backend(url, service) for url, service in parse_backends(RSSHUB_BATCH_URL)]) if RSSHUB_BATCH_URL else None
+feed_pool = batch_pool or rsshub_pool  # The pool polling depends on
+
+def record_rsshub_outcome(pool, backend, kind, user, latency):
+    """Feed a fetch outcome into the instance's health, refreshing its cookies when it looks broken"""
+    opened = pool.release(backend, kind, latency)
+    rsshub_fetch_seconds.observe(latency, backend.url, kind)
+    if opened:
+        logger.error(f"🔌 RSSHub circuit open for {backend.url} after {kind} for {user} "
+                     f"(error rate {backend.health.error_rate():.0%}) - pausing it for {backend.health.time_until_retry()/60:.1f} minutes")
+    # Auth errors point at stale cookies, other sustained errors might too. Being rate limited doesn't.
+    if kind == AUTH or (opened and kind != RATE_LIMITED):
+        on_rsshub_failure(backend, f"{kind} for {user}")
+
+# Shared HTTP session so feed fetches reuse keep-alive connections
+http_session = requests.Session()
+http_session.mount("http://", HTTPAdapter(pool_maxsize=FETCH_CONCURRENCY))
+http_session.mount("https://", HTTPAdapter(pool_maxsize=FETCH_CONCURRENCY))
+
+# Feed fetches get their own threads, so FETCH_CONCURRENCY isn't capped by the default
+# executor's size (cpu count + 4) or held up by posts sharing it
+fetch_executor = ThreadPoolExecutor(max_workers=FETCH_CONCURRENCY, thread_name_prefix="fetch")
+
+async def run_fetch(fn, *args):
+    """Run blocking feed work on the fetch threads"""
+    return await asyncio.get_running_loop().run_in_executor(fetch_executor, functools.partial(fn, *args))
+
+# ETag / Last-Modified validators and parsed entries per feed URL
+feed_cache = {}
+
+def fetch_tweet_entries(user, url_for, pool=None, stop_at=None, backend=None):
+    """Fetch a user's (or a batch route's) feed entries from the RSSHub pool
+
+    `url_for(backend)` builds the feed URL on an instance. Errors fail over
+    to the next best healthy instance, so one instance losing its cookies
+    doesn't stop polling. Returns None when no instance gave an answer, so an
+    outage isn't mistaken for a quiet feed. `backend` is an instance already
+    acquired from the pool for the first attempt.
+    """
+    pool = pool or rsshub_pool
+    tried = []
+    while len(tried) < len(pool):
+        if backend is None:
+            backend = pool.acquire(exclude=tried)
+        if backend is None:
+            logger.warning("🔌 No healthy RSSHub instance left to fetch %s", user)
+            break
+        tried.append(backend)
         
-        if result.returncode == 0:
-            logger.info("✅ Successfully refreshed cookies")
-            logger.debug(f"Cookie refresher output: {result.stdout}")
-        else:
-            logger.error(f"❌ Cookie refresher failed with code {result.returncode}")
-            logger.error(f"Error output: {result.stderr}")
-            
-        # Verify that cookie files exist
-        cookie_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "user_data")
-        if os.path.exists(cookie_file):
-            logger.info("✅ Cookie data directory exists")
-        else:
-            logger.error("❌ Cookie data directory not found")
-            
-    except Exception as e:
-        logger.error(f"❌ Failed to refresh cookies: {e}")
-        logger.exception("Detailed error:")
+        started = time.monotonic()
+        kind, entries = fetch_feed_url(user, url_for(backend), stop_at)
+        record_rsshub_outcome(pool, backend, kind, user, time.monotonic() - started)
+        if kind not in ERRORS:
+            return entries
+        if len(tried) < len(pool):
+            logger.warning("↪️ %s from %s, failing over to another RSSHub instance", kind, backend.url)
+        backend = None
+    return None
 
-def fetch_tweet_entries(user, rss_url):
-    """Fetch tweet URLs from RSS with health check and failure handling"""
-    logger.info(f"🔍 Checking feed for {user} at {rss_url}")
+def fetch_feed_url(user, rss_url, stop_at=None):
+    """Fetch tweet entries from one feed URL with a single conditional request
+
+    Tweets by `user` at or below the `stop_at` tweet ID may be left out. Returns
+    (outcome kind, entries), see rsshub_health.
+    """
+    logger.info("🔍 Checking feed for %s at %s", user, rss_url)
     
     try:
-        # Test RSSHub connection first
+        # Download the feed once, reusing pooled keep-alive connections
+        headers = {}
+        cached = feed_cache.get(rss_url)
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
         try:
-            response = requests.get(rss_url)
-            logger.info(f"RSSHub response status: {response.status_code}")
+            response = http_session.get(rss_url, headers=headers, timeout=FEED_TIMEOUT)
+            logger.info("RSSHub response status: %s", response.status_code)
+            if response.status_code == 304 and cached:
+                # Unchanged since last poll, skip parsing entirely
+                logger.info("✓ Feed for %s not modified, reusing %d cached entries", user, len(cached["entries"]))
+                return OK, list(cached["entries"])
             if response.status_code != 200:
-                logger.error(f"RSSHub error response: {response.text}")
-                on_rsshub_failure()
-                return []
+                logger.error("RSSHub error response: %s", response.text)
+                return classify_status(response.status_code), []
         except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to connect to RSSHub: {e}")
-            on_rsshub_failure()
-            return []
+            logger.error("Failed to connect to RSSHub: %s", e)
+            return CONNECTION, []
         
-        # Set timeout for feedparser through urllib
-        feedparser.SOCKET_TIMEOUT = 5  # 5 second timeout
-        feed = feedparser.parse(rss_url)
+        # Parse the bytes we already downloaded instead of fetching again, streaming
+        # RSSHub's RSS and stopping at the last seen tweet, feedparser for anything else
+        parse_started = time.perf_counter()
+        try:
+            entries = parse_rsshub_feed(response.content, user, stop_at)
+            feed_parse_seconds.observe(time.perf_counter() - parse_started, "stream")
+        except ValueError as e:
+            logger.debug("Streaming parse failed for %s (%s), falling back to feedparser", user, e)
+            entries = parse_feed_fallback(
+                response.content,
+                response_headers={k.lower(): v for k, v in response.headers.items()}
+            )
+            feed_parse_seconds.observe(time.perf_counter() - parse_started, "feedparser")
+            if entries is None:
+                # Not a feed at all (an error page or truncated XML)
+                logger.error("Feed parsing error: %s", e)
+                return PARSE, []
         
-        # Check if feed was successfully fetched
-        if not feed.entries:
-            if hasattr(feed, 'status') and feed.status != 200:
-                logger.error(f"⚠️ RSSHub returned status {feed.status}")
-            if hasattr(feed, 'bozo_exception'):
-                logger.error(f"Feed parsing error: {feed.bozo_exception}")
-            logger.error(f"Feed content: {feed}")
-            on_rsshub_failure()
-            return []
+        if not entries:
+            # A valid feed without items is just a quiet user
+            logger.info("✓ RSSHub feed for %s has no entries", user)
+            return EMPTY, []
             
         logger.info("✓ RSSHub feed fetched successfully")
         
-        entries = []
-        for entry in feed.entries:
-            # Extract tweet ID from link (works with both twitter.com and x.com links)
-            match = re.search(r"(?:twitter|x)\.com/\w+/status/(\d+)", entry.link)
-            if match:
-                tweet_id = match.group(1)
-                
-                # Get content from both title and description
-                title = getattr(entry, 'title', '')
-                description = getattr(entry, 'description', '')
-                
-                # Clean up description (remove HTML tags)
-                clean_description = re.sub(r'<[^>]+>', ' ', description)
-                
-                entries.append({
-                    "id": tweet_id,
-                    "title": title,
-                    "content": clean_description,
-                    "link": entry.link,
-                    "published": getattr(entry, 'published', '')
-                })
+        logger.info("Found %d entries in feed", len(entries))
+        if logger.isEnabledFor(logging.DEBUG):
+            for entry in entries:
+                logger.debug("Tweet: %.50s... (ID: %s)", entry["title"], entry["id"])
         
-        logger.info(f"Found {len(entries)} entries in feed")
-        for entry in entries:
-            logger.debug(f"Tweet: {entry['title'][:50]}... (ID: {entry['id']})")
+        # Remember validators so the next poll can be a conditional request
+        if response.headers.get("ETag") or response.headers.get("Last-Modified"):
+            feed_cache[rss_url] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "entries": list(entries)
+            }
         
-        return entries
+        return OK, entries
         
     except Exception as e:
-        logger.error(f"⚠️ RSSHub request failed: {e}")
-        on_rsshub_failure()
-        return []
+        logger.error("⚠️ RSSHub request failed: %s", e)
+        return PARSE, []
 
 # 2. Use Anthropic to generate a tweet reply
-def generate_reply(tweet_context, user):
-    """Generate a sharp, one-liner Twitter reply using Claude with reduced token overhead"""
+REPLY_CANDIDATES = int(os.getenv("REPLY_CANDIDATES", "1"))  # Drafts requested in parallel per tweet
+GENERATION_MODE = os.getenv("GENERATION_MODE", "direct").lower()  # "direct" or "batch" (Message Batches API)
+BATCH_MAX_SIZE = 20            # Requests per Message Batch
+BATCH_COLLECT_WINDOW = 60      # Seconds to gather requests before submitting a batch
+BATCH_POLL_INTERVAL = 30       # Seconds between batch status checks
+BATCH_LATENCY_CAP = int(os.getenv("BATCH_LATENCY_CAP", "900"))  # Seconds before falling back to direct calls
+REPLY_CACHE_TTL = int(os.getenv("REPLY_CACHE_TTL", str(6 * 60 * 60)))  # Seconds a cached draft stays reusable, 0 disables
+REPLY_CACHE_SIZE = 500         # Contexts kept in the reply cache
+REPLY_CACHE_DRAFT_USES = int(os.getenv("REPLY_CACHE_DRAFT_USES", "1"))  # Times one cached draft may be posted, 1 never repeats a reply
+REPLY_CACHE_ALTERNATES = int(os.getenv("REPLY_CACHE_ALTERNATES", "1"))  # Unposted drafts a cache miss generates at least, for later hits
+REPLY_CACHE_PERSIST = os.getenv("REPLY_CACHE_PERSIST", "1") == "1"  # Keep the cache in data/reply_cache.json
+REPLY_CACHE_FILE = data_dir / "reply_cache.json"
+MAX_REPLY_WORDS = 20
+recent_replies = deque(maxlen=50)  # Recently generated replies, used to penalize repeats
 
-    system_prompt = (
-        "You are a pissed-off, sharp, burned-out rage baiter who only replies to tweets with brutal one-liners that go viral. "
-        "No pleasantries. No setup. No fluff. Em dashes (—) are strictly forbidden. "
-        "Use commas, or periods instead. Always rewrite to avoid them."
-    )
+def word_set(text):
+    return set(re.findall(r"[a-z']+", text.lower()))
 
-    # Customize instructions based on tweet content
-    if "picture" in tweet_context.lower():
-        context_note = (
-            "This tweet is just an image or media with no text. React like:\n"
-            "- 'He really just dropped this and logged off.'\n"
-            "- 'This didn't have to go so hard.'"
-        )
-    else:
-        context_note = "Respond to what they said, and write what you think would get the most engagement (often either a question or a contrarian response)."
+def score_reply(reply, tweet_context, recent=()):
+    """Score a reply draft locally, higher is better (-inf for unusable drafts)"""
+    if not reply:
+        return float("-inf")
+    
+    words = reply.split()
+    score = 0.0
+    
+    # Em dashes are banned outright
+    if "—" in reply:
+        score -= 100
+    
+    # Stay within the word limit, shorter punchlines are slightly better
+    if len(words) > MAX_REPLY_WORDS:
+        score -= 10 * (len(words) - MAX_REPLY_WORDS)
+    score -= 0.1 * len(words)
+    
+    # Repeated words inside the reply
+    reply_words = word_set(reply)
+    if words:
+        score -= 5 * (1 - len(reply_words) / len(words))
+    
+    # Parroting the tweet or our own recent replies
+    for other, weight in [(tweet_context, 5)] + [(previous, 10) for previous in recent]:
+        other_words = word_set(other)
+        if reply_words and other_words:
+            score -= weight * len(reply_words & other_words) / len(reply_words)
+    
+    return score
 
-    prompt = f"""Tweet: {tweet_context}
+reply_scorer = score_reply  # Swap for another (reply, tweet_context, recent) -> float function
 
-Reply rules:
+# Static prompt prefix, built once and marked for Anthropic prompt caching
+REPLY_MODEL = "claude-3-7-sonnet-20250219"
+SYSTEM_PROMPT = (
+    "You are a pissed-off, sharp, burned-out rage baiter who only replies to tweets with brutal one-liners that go viral. "
+    "No pleasantries. No setup. No fluff. Em dashes (—) are strictly forbidden. "
+    "Use commas, or periods instead. Always rewrite to avoid them."
+)
+REPLY_RULES = """Reply rules:
 - Max 20 words
 - Sarcastic, defiant, or darkly funny
 - Punchy, no fluff
 - No praise or agreement
 - No emojis or setup
-- Show who loses or benefits
+- Show who loses or benefits"""
+SYSTEM_BLOCKS = [
+    {
+        "type": "text",
+        "text": f"{SYSTEM_PROMPT}\n\n{REPLY_RULES}",
+        "cache_control": {"type": "ephemeral"}
+    }
+]
+CONTEXT_NOTES = {
+    "picture": (
+        "This tweet is just an image or media with no text. React like:\n"
+        "- 'He really just dropped this and logged off.'\n"
+        "- 'This didn't have to go so hard.'"
+    ),
+    "text": "Respond to what they said, and write what you think would get the most engagement (often either a question or a contrarian response)."
+}
+PROMPT_TEMPLATE = "@grok Tweet: {tweet_context}\n\n{context_note}\n\nReply:"
 
+# Token usage, cached vs uncached input, kept alongside the poll stats
+LLM_USAGE_FIELDS = ("input_tokens", "cache_read_input_tokens", "cache_creation_input_tokens", "output_tokens")
+llm_usage = {"calls": 0, **{field: 0 for field in LLM_USAGE_FIELDS}}
 
-{context_note}
+def restore_llm_usage():
+    """Load the running token totals saved with the stats"""
+    if get_db() is not None:
+        saved = db.get_meta("llm_usage")
+        saved = json.loads(saved) if saved else {}
+    else:
+        saved = load_poll_stats().get("llm_usage", {})
+    llm_usage.update(saved)
 
-Reply:"""
+def record_llm_usage(usage, latency):
+    """Log one call's token usage and add it to the running totals"""
+    load_state()
+    call = {field: usage.get(field) or 0 for field in LLM_USAGE_FIELDS}
+    llm_usage["calls"] += 1
+    for field in LLM_USAGE_FIELDS:
+        llm_usage[field] += call[field]
+    
+    total_input = llm_usage["input_tokens"] + llm_usage["cache_read_input_tokens"] + llm_usage["cache_creation_input_tokens"]
+    cached_share = llm_usage["cache_read_input_tokens"] / total_input if total_input else 0
+    logger.info(f"🧮 LLM call {latency:.2f}s: input {call['input_tokens']} uncached / {call['cache_read_input_tokens']} cached "
+                f"/ {call['cache_creation_input_tokens']} cache write, output {call['output_tokens']} "
+                f"(cached share overall {cached_share:.0%})")
+    
+    if get_db() is not None:
+        db.set_meta("llm_usage", json.dumps(llm_usage))
+    else:
+        data = load_poll_stats()
+        data["llm_usage"] = llm_usage
+        save_poll_stats(data)
 
-    try:
-        message = client.messages.create(
-            model="claude-3-7-sonnet-20250219",
-            max_tokens=60,
-            temperature=1,
-            system=system_prompt,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "@grok " + prompt
-                        }
-                    ]
-                }
-            ]
-        )
-        if message and hasattr(message, 'content') and message.content:
-            return message.content[0].text.strip()
+state_loaded = False
+
+def load_state():
+    """Restore the rate limiter, scheduler and token totals on first use"""
+    global state_loaded
+    if not state_loaded:
+        state_loaded = True
+        restore_rate_limiter()
+        restore_scheduler()
+        restore_llm_usage()
+
+def reply_request_params(prompt):
+    """messages.create arguments for one reply draft"""
+    return {
+        "model": REPLY_MODEL,
+        "max_tokens": 60,
+        "temperature": 1,
+        "system": SYSTEM_BLOCKS,
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": prompt
+                    }
+                ]
+            }
+        ]
+    }
+
+async def create_message(params):
+    """Call messages.create directly and return the message as a dict"""
+    message = await get_llm_client().messages.create(**params)
+    return message.model_dump() if message else None
+
+# Message Batches stage for non-urgent generation (GENERATION_MODE=batch)
+batch_stage = None
+batch_stage_task = None
+
+def get_batch_stage():
+    """The Message Batches stage, started on first use (None in direct mode)"""
+    global batch_stage, batch_stage_task
+    if GENERATION_MODE != "batch":
         return None
-    except Exception as e:
-        logger.error(f"Anthropic error: {e}")
+    if batch_stage is None:
+        batch_stage = BatchReplyStage(
+            AnthropicBatchClient(get_llm_client()),
+            fallback=create_message,
+            max_batch_size=BATCH_MAX_SIZE,
+            collect_window=BATCH_COLLECT_WINDOW,
+            poll_interval=BATCH_POLL_INTERVAL,
+            latency_cap=BATCH_LATENCY_CAP
+        )
+    if batch_stage_task is None or batch_stage_task.done():
+        batch_stage_task = asyncio.create_task(batch_stage.run())
+    return batch_stage
+
+async def draft_reply(prompt):
+    """Request a single reply draft from Claude, directly or through the batch stage"""
+    started = time.monotonic()
+    params = reply_request_params(prompt)
+    stage = get_batch_stage()
+    if stage is not None:
+        message = await stage.generate(params)
+    else:
+        message = await create_message(params)
+    
+    latency = time.monotonic() - started
+    llm_request_seconds.observe(latency, GENERATION_MODE)
+    if message and message.get("usage"):
+        record_llm_usage(message["usage"], latency)
+    if message and message.get("content"):
+        return message["content"][0]["text"].strip()
+    return None
+
+# Content-addressed cache of generated drafts, optionally persisted with the other state
+reply_cache = None
+if REPLY_CACHE_TTL > 0:
+    if REPLY_CACHE_PERSIST:
+        reply_cache_doc = state.document("reply_cache", REPLY_CACHE_FILE, dict)
+        reply_cache = ReplyCache(REPLY_CACHE_SIZE, REPLY_CACHE_TTL, REPLY_CACHE_DRAFT_USES,
+                                 entries=reply_cache_doc.data, on_change=reply_cache_doc.mark_dirty)
+    else:
+        reply_cache = ReplyCache(REPLY_CACHE_SIZE, REPLY_CACHE_TTL, REPLY_CACHE_DRAFT_USES)
+
+async def generate_reply(tweet_context, user, candidates=None):
+    """Generate a sharp, one-liner Twitter reply using Claude with reduced token overhead
+
+    The system prompt and reply rules are a fixed, cached prefix; only the
+    tweet is filled into a precomputed template. With more than one candidate
+    the drafts are requested concurrently and the best one according to
+    `reply_scorer` wins, so latency stays at roughly one LLM round trip.
+    Near-identical contexts within REPLY_CACHE_TTL reuse the unposted
+    alternates of earlier calls; while the cache is on, a miss requests at
+    least REPLY_CACHE_ALTERNATES drafts beyond the one posted to fill it.
+    """
+    if reply_cache is not None:
+        cached = reply_cache.get(tweet_context, user)
+        if cached:
+            logger.info(f"♻️ Reusing cached reply draft (cache hits {reply_cache.hits}, misses {reply_cache.misses})")
+            return cached
+    
+    # Customize instructions based on tweet content
+    context_note = CONTEXT_NOTES["picture" if "picture" in tweet_context.lower() else "text"]
+    prompt = PROMPT_TEMPLATE.format(tweet_context=tweet_context, context_note=context_note)
+
+    candidates = candidates or REPLY_CANDIDATES
+    if reply_cache is not None:
+        # Alternates ride along in the same round trip and share the cached prompt prefix
+        candidates = max(candidates, 1 + REPLY_CACHE_ALTERNATES)
+    results = await asyncio.gather(
+        *(draft_reply(prompt) for _ in range(candidates)),
+        return_exceptions=True
+    )
+    
+    drafts = []
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Anthropic error: {result}")
+        elif result:
+            drafts.append(result)
+    if not drafts:
         return None
+    
+    drafts.sort(key=lambda draft: reply_scorer(draft, tweet_context, recent_replies), reverse=True)
+    best = drafts[0]
+    if len(drafts) > 1:
+        logger.info(f"🏆 Picked best of {len(drafts)} drafts (score {reply_scorer(best, tweet_context, recent_replies):.1f})")
+    recent_replies.append(best)
+    
+    # Keep the alternates so duplicate contexts can use them instead of a new call
+    if reply_cache is not None:
+        reply_cache.put(tweet_context, drafts, user)
+    return best
 
 
 # 3. Post reply
-def reply_to_tweet(tweet_id, message):
+POST_QUEUE_TTL = int(os.getenv("POST_QUEUE_TTL", str(6 * 60 * 60)))  # Seconds a generated reply may wait for a permit
+POST_QUEUE_MAX = 100           # Replies kept waiting at most, oldest are dropped first
+POST_QUEUE_FILE = data_dir / "post_queue.json"
+POST_RETRIES = int(os.getenv("POST_RETRIES", "3"))  # Retries for 503s and failed connections
+POST_RETRY_BASE = 2            # Seconds, doubled per retry (full jitter)
+POST_RETRY_CAP = 300           # Longest single backoff in seconds
+
+# Generated replies waiting for a posting permit, kept across restarts
+post_queue_doc = state.document("post_queue", POST_QUEUE_FILE, dict)
+post_queue = PostQueue(post_queue_doc.data, POST_QUEUE_TTL, POST_QUEUE_MAX, on_change=post_queue_doc.mark_dirty)
+post_queue_event = None  # Wakes the sender when a reply is queued
+
+def note_rate_limit_headers(headers, exhausted=False):
+    """Hold posting until x-rate-limit-reset once Twitter says no requests are left"""
+    remaining = headers.get("x-rate-limit-remaining")
+    if remaining is not None:
+        twitter_rate_limit_remaining.set(int(remaining))
+    if exhausted or remaining == "0":
+        # Twitter's windows are 15 minutes, assume a full one if no reset time was sent
+        reset = int(headers.get("x-rate-limit-reset") or time.time() + 15 * 60)
+        post_queue.block_until(reset)
+        logger.warning(f"⛔ Twitter rate limit exhausted - posting paused until {datetime.fromtimestamp(reset)}")
+
+def record_post_error(reason, started):
+    post_seconds.observe(time.monotonic() - started, reason)
+    post_errors_total.inc(reason)
+
+def post_never_sent(error):
+    """Whether a failed post certainly didn't create a tweet, so sending it again can't duplicate it
+
+    Only failures while connecting (a connect timeout, or a refused or
+    unresolvable connection) and 503s (Twitter didn't take the request) are
+    safe to retry. Once connected, a dropped connection, read timeout or
+    other 5xx may come after the tweet was created.
+    """
+    import tweepy
+    if isinstance(error, tweepy.TwitterServerError):
+        return error.response is not None and error.response.status_code == 503
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError) and error.args:
+        # requests wraps a failed connect as MaxRetryError(reason=NewConnectionError)
+        reason = error.args[0]
+        return isinstance(reason, MaxRetryError) and isinstance(reason.reason, NewConnectionError)
+    return False
+
+async def reply_to_tweet(tweet_id, message):
+    """Post a reply, retrying transient errors with backoff
+
+    The blocking tweepy call runs in a thread (its requests session keeps the
+    connection alive between posts). 429s pause posting until the reset time.
+    Creating a tweet isn't idempotent, so only errors that prove nothing was
+    posted (503s, failures to connect) are retried with jittered exponential
+    backoff; if they keep failing, posting is paused for a while and the reply
+    stays queued. A reply whose fate is unknown (read timeout, dropped
+    connection, other 5xx) is dropped rather than risking a duplicate. Returns None when the reply
+    wasn't posted.
+    """
     # Check rate limits before sending
     if not can_make_reply():
         logger.warning(f"⛔ Rate limit exceeded - not replying to tweet {tweet_id}")
         return None
     
-    try:
-        if TEST_MODE:
-            logger.info(f"🧪 TEST MODE - Would reply to {tweet_id} with: {message}")
-            return {"id": "test_" + str(tweet_id)}
-        
-        # Create a tweet in reply to the specified tweet ID
-        response = api.create_tweet(
-            text=message,
-            in_reply_to_tweet_id=tweet_id
-        )
-        logger.info(f"✅ Replied to tweet {tweet_id}: {message}")
-        
-        # Track this tweet for rate limiting
-        track_reply(tweet_id)
-        
-        return response
-    except tweepy.TweepyException as e:
-        logger.error(f"❌ Error replying to {tweet_id}: {e}")
-        logger.error(f"Error details: {str(e)}")
-        return None
+    if TEST_MODE:
+        logger.info(f"🧪 TEST MODE - Would reply to {tweet_id} with: {message}")
+        return {"id": "test_" + str(tweet_id)}
+    
+    import tweepy  # Loaded with the client, needed here for its exception types
+    for attempt in range(POST_RETRIES + 1):
+        started = time.monotonic()
+        try:
+            # Create a tweet in reply to the specified tweet ID
+            response = await asyncio.to_thread(
+                get_twitter_api().create_tweet,
+                text=message,
+                in_reply_to_tweet_id=tweet_id
+            )
+            post_seconds.observe(time.monotonic() - started, "posted")
+            logger.info(f"✅ Replied to tweet {tweet_id}: {message}")
+            
+            # Track this tweet for rate limiting
+            track_reply(tweet_id)
+            note_rate_limit_headers(response.headers)
+            
+            return response
+        except tweepy.TooManyRequests as e:
+            record_post_error("rate_limited", started)
+            logger.error(f"❌ Twitter rate limited reply to {tweet_id}: {e}")
+            note_rate_limit_headers(e.response.headers, exhausted=True)
+            return None
+        except (tweepy.TwitterServerError, requests.ConnectionError, requests.Timeout) as e:
+            if not post_never_sent(e):
+                record_post_error("unknown_outcome", started)
+                logger.error(f"❌ Reply to {tweet_id} may have been posted despite {e!r} - "
+                             f"dropping it instead of risking a duplicate")
+                return None
+            record_post_error("server_error" if isinstance(e, tweepy.TwitterServerError) else "connection", started)
+            if attempt == POST_RETRIES:
+                pause = POST_RETRY_CAP * random.uniform(0.5, 1)
+                post_queue.block_until(time.time() + pause)
+                logger.error(f"❌ Twitter still failing for {tweet_id} after {attempt + 1} attempts: {e} "
+                             f"- pausing posting for {pause:.0f}s")
+                return None
+            delay = backoff_delay(attempt, POST_RETRY_BASE, POST_RETRY_CAP)
+            logger.warning(f"🔁 Transient error replying to {tweet_id}: {e} - retry {attempt + 1}/{POST_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        except tweepy.TweepyException as e:
+            record_post_error("rejected", started)
+            logger.error(f"❌ Error replying to {tweet_id}: {e}")
+            logger.error(f"Error details: {str(e)}")
+            return None
 
 # Calculate optimal polling intervals based on user count and rate limits
 def get_polling_interval():
@@ -543,108 +1116,387 @@ def get_polling_interval():
     # Return interval in seconds
     return interval
 
-async def check_feed(user):
-    """Check a user's feed for new tweets"""
+def score_reply_target(tweet):
+    """Rank reply candidates: tweets with text beat media-only ones, newer beats older"""
+    return (bool(tweet["title"].strip()), int(tweet["id"]))
+
+def select_reply_targets(tweets, count):
+    """Pick the best `count` new tweets to reply to"""
+    return heapq.nlargest(count, tweets, key=score_reply_target)
+
+async def respond_to_tweet(user, tweet):
+    """Generate a reply to one new tweet (generate stage), returns it for the post stage"""
+    # Determine tweet type and content
+    title = tweet["title"].strip()
+
+    # First check title
+    if title:
+        tweet_type = "text"
+        prompt_context = f"The original tweet from {user} says:\n\n\"{title}\""
+    # If no title, check description for media
+    else:
+        tweet_type = "picture"
+        prompt_context = f"{user} posted a picture"
+    
+    logger.info(f"🤖 Generating reply to {tweet_type} tweet...")
+    reply = await generate_reply(prompt_context, user)
+    
+    if reply:
+        logger.info(f"✍️ Generated reply: {reply}")
+        return [(user, tweet, reply)]
+    logger.error(f"❌ Failed to generate reply for {tweet_type} tweet from {user}")
+    return None
+
+def admit_generation(user, tweet):
+    """Admission control for the generate stage
+
+    Only pay for a reply if a posting permit opens up for it, behind the
+    replies already queued, before it would go stale.
+    """
+    wait = rate_limiter.time_until_available("daily_replies", "monthly_replies", count=len(post_queue) + 1)
+    return max(wait, post_queue.blocked_for()) < POST_QUEUE_TTL
+
+async def reject_generation(user, tweet):
+    logger.warning(f"⛔ Rate limit exceeded - no posting permit before a reply to {tweet['id']} from {user} goes stale, skipping")
+
+async def post_reply(user, tweet, reply):
+    """Queue a generated reply for posting (post stage)"""
+    dropped = post_queue.push(user, tweet["id"], reply)
+    if dropped:
+        logger.warning(f"🗑️ Post queue full - dropped reply to {dropped['tweet_id']} from {dropped['user']}")
+    if post_queue_event is not None:
+        post_queue_event.set()
+
+async def send_queued_replies():
+    """Post queued replies while permits last, returns seconds until the next one can go out"""
+    while True:
+        for entry in post_queue.drop_expired():
+            logger.warning(f"🗑️ Reply to {entry['tweet_id']} from {entry['user']} went stale after "
+                           f"{POST_QUEUE_TTL/3600:.1f}h in the post queue, dropped")
+        entry = post_queue.peek()
+        if entry is None:
+            return None
+        
+        wait = max(time_until_next_reply(), post_queue.blocked_for())
+        if wait > 0:
+            return wait
+        
+        response = await reply_to_tweet(entry["tweet_id"], entry["reply"])
+        if response is None and post_queue.blocked_for() > 0:
+            continue  # Rate limited or Twitter is down, keep the reply for later
+        post_queue.pop()
+        if response:
+            # Mark as replied
+            mark_tweet_as_seen(entry["user"], entry["tweet_id"], replied=True)
+            logger.info(f"✅ Successfully replied to tweet {entry['tweet_id']} from {entry['user']}")
+        # The reply may be on Twitter now, write that down before anything can kill the
+        # process so a restart doesn't send it again from the persisted queue
+        state.flush()
+
+async def run_post_queue():
+    """Send queued replies as soon as rate-limit permits open up"""
+    global post_queue_event
+    post_queue_event = asyncio.Event()
+    while True:
+        post_queue_event.clear()
+        wait = await send_queued_replies()
+        if wait is None:
+            await post_queue_event.wait()
+            continue
+        
+        # Sleep until a permit opens, waking early for replies about to go stale
+        wait = min(wait, post_queue.time_until_expiry())
+        logger.info(f"⏳ {len(post_queue)} replies queued - next posting permit in {wait/60:.1f} minutes")
+        await asyncio.sleep(max(1, wait))
+
+async def fetch_feed(user):
+    """Fetch one user's feed (fetch stage), returns their entries for the filter stage"""
     if not can_poll_feed():
         logger.warning(f"⛔ Poll rate limit reached - skipping check for {user}")
-        return
+        return None
+    # Claim an instance before spending a poll: once an open circuit's wait is over,
+    # only one of the concurrent workers gets its half-open trial
+    backend = rsshub_pool.acquire()
+    if backend is None:
+        logger.warning(f"🔌 Every RSSHub circuit is open - deferring check for {user}")
+        return None
     
     # Track this poll
     track_poll()
     
-        # Calculate URL with limit=1 parameter
-    url = RSSHUB_URL + user + "?limit=1"
+    # Fetch a full page so tweets posted between two polls aren't missed
+    url_for = lambda backend: backend.url + user + f"?limit={FEED_PAGE_SIZE}"
+    
+    # Run the blocking HTTP + parse work in a thread so the event loop stays free
+    entries = await run_fetch(fetch_tweet_entries, user, url_for, rsshub_pool, last_seen_id(user), backend)
+    if entries is None:
+        # RSSHub failed, not the user: leave their stats and the scheduler alone
+        logger.warning(f"⚠️ Could not fetch {user}'s feed from any RSSHub instance, skipping")
+        return None
+    return [(user, entries)]
+
+def batch_feed_url(template, users):
+    """Build the combined/list route URL for a group of users"""
+    return template.replace("{users}", ",".join(users)).replace("{limit}", str(FEED_PAGE_SIZE * len(users)))
 
+def split_entries_by_author(users, entries):
+    """Group batch feed entries per monitored user by the handle in the status link"""
+    by_handle = {user.lower(): user for user in users}
+    grouped = {user: [] for user in users}
+    for entry in entries:
+        user = by_handle.get(entry["author"].lower())
+        if user is not None:
+            grouped[user].append(entry)
+    return grouped
+
+async def fetch_feed_batch(users):
+    """Fetch several users' feeds with a single combined RSSHub request (fetch stage)"""
+    if not can_poll_feed():
+        logger.warning(f"⛔ Poll rate limit reached - skipping batch check for {', '.join(users)}")
+        return None
+    backend = batch_pool.acquire()
+    if backend is None:
+        logger.warning(f"🔌 Every RSSHub circuit is open - deferring batch check for {', '.join(users)}")
+        return None
     
-    try:
-        entries = fetch_tweet_entries(user, url)
-        
-        # Update stats
-        new_tweets_count = 0
+    # One request, one poll against the budget
+    track_poll()
+    
+    # A list route answers for every member, so every monitored author in it gets processed
+    monitored = USERS if LIST_ROUTE else users
+    url_for = lambda backend: batch_feed_url(backend.url, monitored)
+    entries = await run_fetch(fetch_tweet_entries, f"{len(monitored)} users", url_for, batch_pool, None, backend)
+    if entries is None:
+        logger.warning(f"⚠️ Could not fetch the batch feed for {', '.join(users)} from any RSSHub instance, skipping")
+        return None
+    grouped = split_entries_by_author(monitored, entries)
+    selected = set(users)
+    checked = [user for user in monitored if user in selected or grouped[user]]
+    logger.info(f"📦 Batch feed returned {len(entries)} entries for {sum(1 for e in grouped.values() if e)}/{len(monitored)} users")
+    return [(user, grouped[user], False) for user in checked]
+
+async def process_feed_entries(user, entries, warn_if_empty=True):
+    """Find new tweets in a user's feed entries and update stats (filter stage)
+
+    Returns the best new tweets to reply to, for the generate stage.
+    """
+    # Update stats
+    new_tweets_count = 0
+    reply_targets = []
+    
+    if entries:
+        # Sort entries by ID (newer tweets have higher IDs)
+        entries.sort(key=lambda x: int(x["id"]), reverse=True)
         
-        if entries:
-            # Sort entries by ID (newer tweets have higher IDs)
-            entries.sort(key=lambda x: int(x["id"]), reverse=True)
-            
-            # Process most recent tweet
-            for tweet in entries[:1]:
-                # If this is a new tweet we haven't seen before
-                if not is_tweet_seen(user, tweet["id"]):
-                    logger.info(f"🆕 New tweet from {user}:")
-                    logger.info(f"   Link: {tweet['link']}")
-                    logger.info(f"   Content: {tweet['title']}")
-                    new_tweets_count += 1
-                    
-                    # Mark as seen
-                    mark_tweet_as_seen(user, tweet["id"])
-                    
-                    # Determine tweet type and content
-                    title = tweet["title"].strip()
-                    description = tweet["content"]
-
-                    # First check title
-                    if title:
-                        tweet_type = "text"
-                        prompt_context = f"The original tweet from {user} says:\n\n\"{title}\""
-                    # If no title, check description for media
-                    else:
-                        tweet_type = "picture"
-                        prompt_context = f"{user} posted a picture"
-                    
-                    logger.info(f"🤖 Generating reply to {tweet_type} tweet...")
-                    reply = generate_reply(prompt_context, user)
-                    
-                    if reply:
-                        logger.info(f"✍️ Generated reply: {reply}")
-                        # Post the reply if within limits
-                        response = reply_to_tweet(tweet["id"], reply)
-                        if response:
-                            # Mark as replied
-                            mark_tweet_as_seen(user, tweet["id"], replied=True)
-                            logger.info(f"✅ Successfully replied to {tweet_type} tweet {tweet['id']}")
-                    else:
-                        logger.error(f"❌ Failed to generate reply for {tweet_type} tweet from {user}")
-                else:
-                    logger.debug(f"Tweet {tweet['id']} from {user} already seen")
-            
-            logger.info(f"Found {len(entries)} tweets from {user}, {new_tweets_count} new")
+        # Diff the page against the user's high-water mark
+        last_id = last_seen_id(user)
+        if last_id is None:
+            # First time we see this user, only their latest tweet counts as new
+            new_tweets = entries[:1]
         else:
-            logger.warning(f"⚠️ No tweets found for {user}")
+            new_tweets = [tweet for tweet in entries if int(tweet["id"]) > last_id]
+        new_tweets_count = len(new_tweets)
         
-        # Update user statistics
-        stats = update_user_stats(user, len(entries), new_tweets_count)
-        logger.info(f"📊 User stats for {user}: hit rate {stats['hit_rate']:.2f}, new tweets {stats['new_tweets']}/{stats['total_tweets']}")
+        for tweet in new_tweets:
+            logger.info("🆕 New tweet from %s:\n   Link: %s\n   Content: %s", user, tweet["link"], tweet["title"])
         
+        if new_tweets:
+            # Mark the whole page as seen, then hand the best candidates on
+            mark_tweet_as_seen(user, new_tweets[0]["id"])
+            reply_targets = select_reply_targets(new_tweets, MAX_REPLIES_PER_POLL)
+        else:
+            logger.debug("No tweets from %s newer than %s", user, last_id)
+        
+        logger.info("Found %d tweets from %s, %d new", len(entries), user, new_tweets_count)
+    elif warn_if_empty:
+        logger.warning("⚠️ No tweets found for %s", user)
+    
+    # Update user statistics
+    stats = update_user_stats(user, len(entries), new_tweets_count)
+    record_scheduler_poll(user, new_tweets_count)
+    logger.info("📊 User stats for %s: hit rate %.2f, new tweets %s/%s",
+                user, stats["hit_rate"], stats["new_tweets"], stats["total_tweets"])
+    return [(user, tweet) for tweet in reply_targets]
+
+async def check_feed(user):
+    """Check a user's feed for new tweets, running every stage inline"""
+    load_state()
+    bind_cookie_services()
+    try:
+        for feed in await fetch_feed(user) or ():
+            for target in await process_feed_entries(*feed):
+                if not admit_generation(*target):
+                    await reject_generation(*target)
+                    continue
+                for reply in await respond_to_tweet(*target) or ():
+                    await post_reply(*reply)
+        await send_queued_replies()
     except Exception as e:
         logger.error(f"❌ Error checking feed for {user}: {e}")
         logger.exception("Detailed error:")
 
+# Staged pipeline: fetch -> filter -> generate -> post, connected by bounded queues.
+# A slow LLM call only backs up the generate queue, polling keeps going until it fills.
+GENERATE_WORKERS = int(os.getenv("GENERATE_WORKERS", "2"))  # Replies generated concurrently
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))  # Items buffered between two stages
+
+def build_pipeline():
+    if GENERATION_MODE == "batch":
+        # Batched requests wait minutes, enough workers to fill a batch
+        generate_workers = max(GENERATE_WORKERS, BATCH_MAX_SIZE)
+    else:
+        generate_workers = GENERATE_WORKERS
+    fetch_handler = fetch_feed_batch if RSSHUB_BATCH_URL else fetch_feed
+    timer = lambda name: functools.partial(observe_stage, name)
+    return Pipeline([
+        Stage("fetch", fetch_handler, FETCH_CONCURRENCY, PIPELINE_QUEUE_SIZE,
+              delay=(USER_DELAY_MIN, USER_DELAY_MAX), observe=timer("fetch")),  # Spaced starts between users to avoid rate limits
+        Stage("filter", process_feed_entries, 1, PIPELINE_QUEUE_SIZE, observe=timer("filter")),
+        Stage("generate", respond_to_tweet, generate_workers, PIPELINE_QUEUE_SIZE,
+              admit=admit_generation, on_reject=reject_generation, observe=timer("generate")),
+        Stage("post", post_reply, 1, PIPELINE_QUEUE_SIZE, observe=timer("post"))
+    ])
+
+def observe_stage(name, seconds):
+    stage_seconds.observe(seconds, name)
+
+pipeline = None
+post_queue_task = None
+
+def get_pipeline():
+    """The running pipeline, started on first use inside the event loop"""
+    load_state()
+    global pipeline, post_queue_task
+    bind_cookie_services()
+    if pipeline is None:
+        pipeline = build_pipeline()
+    pipeline.start()
+    if post_queue_task is None:
+        post_queue_task = asyncio.create_task(run_post_queue())
+    return pipeline
+
+async def check_users(users):
+    """Queue a round of feed checks and wait until they're fetched and filtered
+
+    Fetches keep the per-user spacing rule: each user (or batch of users)
+    starts a jittered USER_DELAY after the previous one, however many fetch
+    workers are idle. Generation and posting carry on
+    in the background, so the next round isn't held up by the LLM.
+    """
+    pipe = get_pipeline()
+    if RSSHUB_BATCH_URL:
+        # One combined request per group of users (a plain list route covers everyone at once)
+        group_size = len(users) if LIST_ROUTE else FEED_BATCH_SIZE
+        for i in range(0, len(users), group_size):
+            await pipe.submit(users[i:i + group_size])
+    else:
+        for user in users:
+            await pipe.submit(user)
+    await pipe.join("fetch", "filter")
+
+def seen_marks_count():
+    if get_db() is not None:
+        return db.seen_marks_count()
+    return len(load_seen_tweets()["marks"])
+
+# Metrics read from existing state at scrape time, nothing to record on the hot path
+metrics.callback("rate_limit_headroom", "Permits left in each sliding-window limit",
+                 lambda: {(name,): limiter.remaining() for name, limiter in rate_limiter.limiters.items()}, ("limit",))
+metrics.callback("seen_marks", "Users with a seen tweet mark", seen_marks_count)
+metrics.callback("seen_marks_evicted_total", "Seen tweet marks evicted by compaction since startup",
+                 lambda: seen_tweets_evicted_total, kind="counter")
+metrics.callback("scheduler_selected_expected_new", "Expected new tweets from the users picked in the last check",
+                 lambda: scheduler_metrics.get("selected_expected_new", 0))
+metrics.callback("scheduler_uniform_expected_new", "Expected new tweets had the last check picked users uniformly",
+                 lambda: scheduler_metrics.get("uniform_expected_new", 0))
+metrics.callback("scheduler_expected_yield", "Chance that polling a user now finds a new tweet",
+                 lambda: {(user,): scheduler.expected_yield(user) for user in USERS}, ("user",))
+metrics.callback("llm_tokens_total", "LLM tokens used, by type",
+                 lambda: {(field,): llm_usage[field] for field in LLM_USAGE_FIELDS}, ("type",), kind="counter")
+metrics.callback("cookie_refreshes_total", "Cookie refresh requests by RSSHub service and what became of them",
+                 lambda: {(service, event): count for service, cookie_service in cookie_services.items()
+                          for event, count in cookie_service.stats.items()},
+                 ("service", "event"), kind="counter")
+metrics.callback("rsshub_circuit_open", "Whether an RSSHub instance's circuit is open (1) or half-open (0.5)",
+                 lambda: {(backend.url,): {"closed": 0, "half_open": 0.5, "open": 1}[backend.health.state]
+                          for pool in (rsshub_pool, batch_pool) if pool for backend in pool},
+                 ("backend",))
+metrics.callback("post_queue_length", "Generated replies waiting to be posted", lambda: len(post_queue))
+metrics.callback("pipeline_queued", "Items waiting in each pipeline stage's queue",
+                 lambda: {(name,): stage.queue.qsize() for name, stage in (pipeline.stages.items() if pipeline else ())},
+                 ("stage",))
+metrics.callback("pipeline_items_total", "Items handled by each pipeline stage, by result",
+                 lambda: {(name, result): count for name, stage in (pipeline.stages.items() if pipeline else ())
+                          for result, count in stage.stats.items()},
+                 ("stage", "result"), kind="counter")
+metrics.callback("reply_cache_hits_total", "Replies reused from the draft cache",
+                 lambda: reply_cache.hits if reply_cache is not None else 0, kind="counter")
+metrics.callback("log_records_dropped_total", "Log records dropped because the log queue was full",
+                 lambda: sum(getattr(handler, "dropped", 0) for handler in logging.getLogger().handlers), kind="counter")
+
+async def start_metrics_server():
+    """Serve /metrics when METRICS_PORT is set"""
+    if not METRICS_PORT:
+        return None
+    server = await serve_metrics(metrics, METRICS_HOST, METRICS_PORT)
+    logger.info(f"📈 Metrics at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+    return server
+
+def stop_on_sigterm():
+    """Cancel the running task on SIGTERM (how supervisor stops the bot), which would otherwise skip atexit"""
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except NotImplementedError:
+        pass  # No signal handlers on Windows event loops
+
 async def poll_all_users():
     """Main polling loop that runs 16 times per day, checking 3 random users each time"""
+    stop_on_sigterm()
     logger.info("🤖 Starting Twitter reply bot...")
     logger.info(f"📡 Monitoring pool of users: {', '.join(USERS)}")
-    logger.info(f"📊 Schedule: {MAX_POLLS_PER_DAY} checks per day, {USERS_PER_CHECK} users per check")
+    logger.info(f"📊 Schedule: {MAX_POLLS_PER_DAY} checks per day, {USERS_PER_CHECK} users per check "
+                f"({REQUESTS_PER_CHECK} feed requests)")
+    logger.info(f"⚡ Fetch concurrency: {FETCH_CONCURRENCY} feeds in parallel")
+    logger.info(f"🛰️ RSSHub instances: {', '.join(f'{b.url} ({b.service})' for b in rsshub_pool)}")
+    logger.info(f"🚰 Pipeline: {GENERATE_WORKERS} generate workers, queues of {PIPELINE_QUEUE_SIZE}")
+    if post_queue:
+        logger.info(f"📮 Resuming {len(post_queue)} queued replies (stale after {POST_QUEUE_TTL/3600:.1f}h)")
+    if RSSHUB_BATCH_URL:
+        logger.info(f"📦 Batch feed mode: {RSSHUB_BATCH_URL} ({FEED_BATCH_SIZE} users per request)")
+    logger.info(f"🎯 User selection: {SCHEDULER_MODE}")
     logger.info(f"⏰ Base interval between checks: {BASE_INTERVAL/60:.1f} minutes (±15% jitter)")
     
+    # Persist state changes in the background instead of on every call
+    flush_task = asyncio.create_task(state.run_flusher())
+    
+    # Drop seen marks of users we stopped monitoring
+    compaction_task = asyncio.create_task(run_seen_tweets_compaction())
+    
+    metrics_server = await start_metrics_server()
+    
     while True:
         try:
             # Skip if we've hit the daily check limit
             if not can_poll_feed():
-                logger.warning("⛔ Daily check limit reached - waiting until next reset")
-                await asyncio.sleep(get_polling_interval())
+                wait_time = time_until_next_poll()
+                logger.warning(f"⛔ Daily check limit reached - next poll permit in {wait_time/60:.1f} minutes")
+                await asyncio.sleep(wait_time)
+                continue
+            
+            # Don't spend polls on a backend that's down, wait for the circuit to half-open
+            retry_in = feed_pool.time_until_retry()
+            if retry_in > 0:
+                logger.warning(f"🔌 RSSHub circuit open - next check in {retry_in/60:.1f} minutes")
+                await asyncio.sleep(retry_in)
                 continue
             
-            # Randomly select users to check
-            users_to_check = random.sample(USERS, USERS_PER_CHECK)
+            # Pick the users most likely to have posted since we last looked
+            users_to_check = select_users_to_check(min(USERS_PER_CHECK, len(USERS)))
             logger.info(f"🎲 Selected users for this check: {', '.join(users_to_check)}")
             
-            # Check each selected user
-            for user in users_to_check:
-                await check_feed(user)
-                
-                # Small delay between users to avoid rate limits
-                if user != users_to_check[-1]:  # Don't wait after last user
-                    await asyncio.sleep(random.uniform(200, 500))
+            # Check the selected users with a bounded pool of workers
+            await check_users(users_to_check)
+            logger.debug("Pipeline stages: %s", get_pipeline().metrics())
             
             # Calculate wait time until next check (base interval ±15%)
             wait_time = max(
@@ -661,13 +1513,63 @@ async def poll_all_users():
             # Wait a bit before retrying on error
             await asyncio.sleep(MIN_INTERVAL)
 
-# Entry point
-if __name__ == "__main__":
+def dry_start():
+    """Time imports and initialization without polling, returns the timings in seconds"""
+    timings = {"import": import_ready - import_started}
+    
+    def timed(name, fn):
+        started = time.perf_counter()
+        fn()
+        timings[name] = time.perf_counter() - started
+    
+    def load_all_state():
+        load_state()
+        for document in state.documents.values():
+            document.data
+    
+    timed("logging", setup_logging)
+    timed("settings", settings.require)
+    timed("state", load_all_state)
+    timed("twitter_client", get_twitter_api)
+    timed("llm_client", get_llm_client)
+    timings["total"] = time.perf_counter() - import_started
+    
+    logger.info("⏱️ Dry start: " + ", ".join(f"{name} {seconds*1000:.1f}ms" for name, seconds in timings.items()))
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="Twitter reply bot")
+    parser.add_argument("--dry-start", action="store_true",
+                        help="initialize everything, report import and init times, and exit without polling")
+    args = parser.parse_args()
+    
+    if args.dry_start:
+        dry_start()
+        return
+    
+    setup_logging()
+    
+    # Verify required environment variables
+    missing_vars = settings.missing()
+    if missing_vars:
+        logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
+        raise SystemExit(1)
+    
     try:
         asyncio.run(poll_all_users())
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
+    except asyncio.CancelledError:
+        # SIGTERM: write out what the last flush interval changed before exiting
+        state.flush()
+        logger.info("Bot stopped by SIGTERM")
     except Exception as e:
         logger.error(f"Bot crashed: {e}")
         logger.exception("Detailed error:")
         raise
+
+import_ready = time.perf_counter()
+
+# Entry point
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import abc
+import asyncio
+import itertools
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BatchClient(abc.ABC):
+    """Interface to a Message Batches backend
+
+    Requests and results use the Message Batches wire format:
+    {"custom_id": ..., "params": {...messages.create kwargs...}} in, and
+    message dicts (or None for failed requests) keyed by custom_id out.
+    """
+
+    @abc.abstractmethod
+    async def create(self, requests):
+        """Submit a batch, returns its id"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def status(self, batch_id):
+        """Return the batch processing status ("in_progress", "canceling" or "ended")"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def results(self, batch_id):
+        """Return {custom_id: message dict or None} for an ended batch"""
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def cancel(self, batch_id):
+        raise NotImplementedError
+
+
+class AnthropicBatchClient(BatchClient):
+    """BatchClient over the Anthropic /v1/messages/batches endpoints"""
+
+    def __init__(self, client):
+        self.client = client  # anthropic.AsyncAnthropic
+
+    async def create(self, requests):
+        batch = await self.client.post("/v1/messages/batches", body={"requests": requests}, cast_to=object)
+        return batch["id"]
+
+    async def status(self, batch_id):
+        batch = await self.client.get(f"/v1/messages/batches/{batch_id}", cast_to=object)
+        return batch["processing_status"]
+
+    async def results(self, batch_id):
+        import httpx  # Already loaded by the anthropic client, kept out of module import
+        response = await self.client.get(f"/v1/messages/batches/{batch_id}/results", cast_to=httpx.Response)
+        results = {}
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            result = item.get("result", {})
+            results[item["custom_id"]] = result.get("message") if result.get("type") == "succeeded" else None
+        return results
+
+    async def cancel(self, batch_id):
+        await self.client.post(f"/v1/messages/batches/{batch_id}/cancel", cast_to=object)
+
+
+class BatchReplyStage:
+    """Collects reply requests into Message Batches and resolves them as results arrive
+
+    Requests wait up to `collect_window` seconds (or until `max_batch_size`
+    are queued) before a batch is submitted. A batch that hasn't ended within
+    `latency_cap` seconds is cancelled and its unfinished requests go through
+    `fallback`, a direct params -> message dict coroutine, as do requests
+    whose batch couldn't be submitted at all.
+    """
+
+    def __init__(self, batch_client, fallback, max_batch_size=20, collect_window=30,
+                 poll_interval=30, latency_cap=600):
+        self.batch_client = batch_client
+        self.fallback = fallback
+        self.max_batch_size = max_batch_size
+        self.collect_window = collect_window
+        self.poll_interval = poll_interval
+        self.latency_cap = latency_cap
+        self.queue = asyncio.Queue()
+        self.batch_tasks = set()
+        self.ids = itertools.count(1)
+
+    async def generate(self, params):
+        """Queue one messages.create request and wait for its message dict (or None)"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((f"reply-{next(self.ids)}", params, future))
+        return await future
+
+    async def _collect(self):
+        """Wait for a first request, then gather more until the window closes or the batch is full"""
+        jobs = [await self.queue.get()]
+        deadline = time.monotonic() + self.collect_window
+        while len(jobs) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                jobs.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return jobs
+
+    async def run(self):
+        """Submit batches for as long as the stage is running"""
+        while True:
+            jobs = await self._collect()
+            task = asyncio.create_task(self._process(jobs))
+            self.batch_tasks.add(task)
+            task.add_done_callback(self.batch_tasks.discard)
+
+    async def _process(self, jobs):
+        pending = {custom_id: (params, future) for custom_id, params, future in jobs}
+        started = time.monotonic()
+        try:
+            batch_id = await self.batch_client.create(
+                [{"custom_id": custom_id, "params": params} for custom_id, (params, _) in pending.items()]
+            )
+            logger.info(f"📨 Submitted reply batch {batch_id} with {len(pending)} requests")
+
+            while time.monotonic() - started < self.latency_cap:
+                await asyncio.sleep(self.poll_interval)
+                if await self.batch_client.status(batch_id) == "ended":
+                    results = await self.batch_client.results(batch_id)
+                    for custom_id, message in results.items():
+                        if custom_id in pending and message is not None:
+                            _, future = pending.pop(custom_id)
+                            if not future.done():
+                                future.set_result(message)
+                    logger.info(f"📬 Reply batch {batch_id} ended after {time.monotonic() - started:.0f}s, "
+                                f"{len(jobs) - len(pending)}/{len(jobs)} succeeded")
+                    break
+            else:
+                logger.warning(f"⏱️ Reply batch {batch_id} exceeded {self.latency_cap}s, falling back to direct calls")
+                try:
+                    await self.batch_client.cancel(batch_id)
+                except Exception as e:
+                    logger.error(f"Failed to cancel reply batch {batch_id}: {e}")
+        except Exception as e:
+            logger.error(f"❌ Reply batch failed: {e}")
+
+        # Anything still unresolved goes through direct calls
+        await asyncio.gather(*(self._fall_back(params, future) for params, future in pending.values()))
+
+    async def _fall_back(self, params, future):
+        try:
+            message = await self.fallback(params)
+        except Exception as e:
+            logger.error(f"Direct reply fallback failed: {e}")
+            message = None
+        if not future.done():
+            future.set_result(message)
@@ -0,0 +1,204 @@
+"""Offline end-to-end benchmark of the polling pipeline
+
+    python benchmarks/bench_e2e.py [--users 10000] [--rounds 2] [--output results.json]
+
+Starts fake RSSHub, Twitter and Anthropic servers in a child process, points
+the bot at them, checks every user `--rounds` times through the real
+fetch -> filter -> generate -> post pipeline and waits for the post queue to
+drain. Prints (and optionally writes) a JSON report: polls/sec, tweets/sec,
+replies/sec, p50/p99 latency per stage and the bot process' peak RSS.
+Rate limits are lifted and the per-user delay is zero, so this measures the
+bot's own throughput rather than its budgets.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import fakes  # noqa: E402
+from requests.adapters import HTTPAdapter  # noqa: E402
+
+
+class RedirectAdapter(HTTPAdapter):
+    """Sends requests for one host to another base URL (tweepy hard-codes api.twitter.com)"""
+
+    def __init__(self, source, target):
+        super().__init__()
+        self.source = source
+        self.target = target
+
+    def send(self, request, **kwargs):
+        request.url = request.url.replace(self.source, self.target, 1)
+        return super().send(request, **kwargs)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "p50_ms": None if not samples else round(percentile(samples, 50) * 1000, 2),
+        "p99_ms": None if not samples else round(percentile(samples, 99) * 1000, 2),
+    }
+
+
+def timed(fn, samples):
+    """Wrap a coroutine function so each call's duration lands in `samples`"""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await fn(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - started)
+    return wrapper
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run(app, users, rounds):
+    latencies = {"fetch": [], "filter": [], "generate": [], "post": []}
+    counts = {"new_tweets": 0}
+
+    pipeline = app.get_pipeline()
+    for name in ("fetch", "filter", "generate"):
+        pipeline[name].handler = timed(pipeline[name].handler, latencies[name])
+
+    filter_handler = pipeline["filter"].handler
+
+    async def count_new(user, entries, *rest):
+        targets = await filter_handler(user, entries, *rest)
+        counts["new_tweets"] += len(targets)
+        return targets
+    pipeline["filter"].handler = count_new
+    app.reply_to_tweet = timed(app.reply_to_tweet, latencies["post"])
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await app.check_users(users)
+    fetch_done = time.perf_counter()
+
+    # Let generation and posting finish
+    await pipeline.join()
+    while len(app.post_queue):
+        await asyncio.sleep(0.05)
+    finished = time.perf_counter()
+
+    metrics = pipeline.metrics()
+    polls = metrics["fetch"]["processed"]
+    return {
+        "elapsed_s": round(finished - started, 3),
+        "polling_elapsed_s": round(fetch_done - started, 3),
+        "polls": polls,
+        "polls_per_sec": round(polls / (fetch_done - started), 1),
+        "new_tweets": counts["new_tweets"],
+        "tweets_per_sec": round(counts["new_tweets"] / (finished - started), 1),
+        "replies_posted": len(latencies["post"]),
+        "replies_per_sec": round(len(latencies["post"]) / (finished - started), 1),
+        "stage_latency": {name: summarize(samples) for name, samples in latencies.items()},
+        "stage_errors": {name: stage["failed"] for name, stage in metrics.items()},
+        "reply_cache_hits": app.reply_cache.hits if app.reply_cache else 0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--fetch-concurrency", type=int, default=64)
+    parser.add_argument("--generate-workers", type=int, default=16)
+    parser.add_argument("--rsshub-latency", type=float, default=0.02, help="seconds, ±50%%")
+    parser.add_argument("--rsshub-error-rate", type=float, default=0.0)
+    parser.add_argument("--new-tweet-rate", type=float, default=0.2, help="chance a poll finds a new tweet")
+    parser.add_argument("--twitter-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    config = {
+        "rsshub": {"latency": args.rsshub_latency, "error_rate": args.rsshub_error_rate,
+                   "new_tweet_rate": args.new_tweet_rate},
+        "twitter": {"latency": args.twitter_latency},
+        "anthropic": {"latency": args.llm_latency},
+    }
+    ready = multiprocessing.Queue()
+    fake_process = multiprocessing.Process(target=fakes.serve_all, args=(config, ready), daemon=True)
+    fake_process.start()
+    urls = ready.get(timeout=30)
+
+    # Point the bot at the fakes and keep its state in a scratch directory
+    os.environ.update({
+        "TWITTER_API_KEY": "bench", "TWITTER_API_SECRET": "bench",
+        "TWITTER_ACCESS_TOKEN": "bench", "TWITTER_ACCESS_SECRET": "bench",
+        "ANTHROPIC_API_KEY": "bench", "ANTHROPIC_BASE_URL": urls["anthropic"],
+        "TWITTER_USERNAME": "bench", "TWITTER_PASSWORD": "bench",
+        "RSSHUB_URL": urls["rsshub"] + "/twitter/user/",
+        "FETCH_CONCURRENCY": str(args.fetch_concurrency),
+        "GENERATE_WORKERS": str(args.generate_workers),
+        "PIPELINE_QUEUE_SIZE": str(max(100, args.fetch_concurrency * 4)),
+        "STORAGE_BACKEND": args.storage,
+        "REPLY_CACHE_PERSIST": "0",
+    })
+    os.chdir(tempfile.mkdtemp(prefix="twitbot-bench-"))
+    logging.basicConfig(level=args.log_level, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    import app
+    from rate_limiter import SlidingWindowLimiter
+    for name, limiter in app.rate_limiter.limiters.items():
+        app.rate_limiter.limiters[name] = SlidingWindowLimiter(10 ** 9, limiter.window)
+    app.USER_DELAY_MIN = app.USER_DELAY_MAX = 0
+    app.post_queue.max_size = 10 ** 9
+    app.get_twitter_api().session.mount("https://api.twitter.com",
+                                        RedirectAdapter("https://api.twitter.com", urls["twitter"]))
+
+    users = [f"user{i}" for i in range(args.users)]
+    results = asyncio.run(run(app, users, args.rounds))
+    fake_process.terminate()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_revision": git_revision(),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
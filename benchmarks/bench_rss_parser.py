@@ -0,0 +1,60 @@
+"""Micro-benchmark: streaming RSSHub parser vs feedparser on the recorded fixtures
+
+    python benchmarks/bench_rss_parser.py [--runs 200]
+
+For each fixture it times a full parse with feedparser, a full parse with
+parse_rsshub_feed, and an incremental parse that stops after the 3 newest
+tweets (a typical poll), and prints the results as JSON.
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rss_parser import parse_feed_fallback, parse_rsshub_feed  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def time_per_call(fn, runs):
+    fn()  # Warm up
+    started = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - started) / runs
+
+
+def bench_fixture(path, runs):
+    content = path.read_bytes()
+    entries = parse_rsshub_feed(content)
+    assert entries == parse_feed_fallback(content), f"{path.name}: parsers disagree"
+    user, stop_at = entries[3]["author"], int(entries[3]["id"])
+
+    results = {
+        "feedparser": time_per_call(lambda: parse_feed_fallback(content), runs),
+        "stream_full": time_per_call(lambda: parse_rsshub_feed(content), runs),
+        "stream_stop_early": time_per_call(lambda: parse_rsshub_feed(content, user, stop_at), runs),
+    }
+    return {
+        "fixture": path.name,
+        "bytes": len(content),
+        "entries": len(entries),
+        "ms_per_parse": {name: round(seconds * 1000, 3) for name, seconds in results.items()},
+        "speedup_full": round(results["feedparser"] / results["stream_full"], 1),
+        "speedup_stop_early": round(results["feedparser"] / results["stream_stop_early"], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+    results = [bench_fixture(path, args.runs) for path in sorted(FIXTURES.glob("rsshub_*.xml"))]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
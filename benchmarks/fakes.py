@@ -0,0 +1,157 @@
+"""Local stand-ins for RSSHub, the Twitter API and the Anthropic API
+
+Each fake is a ThreadingHTTPServer with configurable latency and error rate.
+`serve_all` runs all three, meant for a separate process so the fakes don't
+compete with the bot for the GIL.
+"""
+import email.utils
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+RECORDED_HANDLE_RE = re.compile(rb"(?:twitter|x)\.com/(\w+)")
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real services
+    latency = 0.0
+    error_rate = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def delay_or_fail(self):
+        """Sleep the configured latency (±50%), returns True if this request should fail"""
+        if self.latency:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            self.send_body(503, b"Service Unavailable", "text/plain")
+            return True
+        return False
+
+    def send_body(self, status, body, content_type, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+
+class FakeRSSHub(FakeHandler):
+    """Serves /twitter/user/<handle> feeds
+
+    Every `recorded_every`-th user gets a recorded fixture (with the handle
+    swapped in), the others a synthetic feed. Each request posts a new tweet
+    for the user with probability `new_tweet_rate`.
+    """
+    new_tweet_rate = 0.2
+    recorded_every = 10
+    page_size = 20
+    recorded = [path.read_bytes() for path in sorted(FIXTURES.glob("rsshub_*.xml"))]
+    latest = {}
+    lock = threading.Lock()
+    ids = itertools.count(1_900_000_000_000_000_000, 1_000_000)
+
+    def do_GET(self):
+        if self.delay_or_fail():
+            return
+        path, _, _ = self.path.partition("?")
+        handle = path.rstrip("/").rsplit("/", 1)[-1]
+        index = int(re.sub(r"\D", "", handle) or 0)
+
+        if self.recorded and index % self.recorded_every == 0:
+            body = self.recorded_feed(handle, index)
+        else:
+            body = self.synthetic_feed(handle)
+        self.send_body(200, body, "application/rss+xml; charset=utf-8")
+
+    def recorded_feed(self, handle, index):
+        fixture = self.recorded[index // self.recorded_every % len(self.recorded)]
+        return RECORDED_HANDLE_RE.sub(lambda m: m.group(0).replace(m.group(1), handle.encode()), fixture)
+
+    def synthetic_feed(self, handle):
+        with self.lock:
+            tweets = self.latest.setdefault(handle, [next(self.ids)])
+            if random.random() < self.new_tweet_rate:
+                tweets.insert(0, next(self.ids))
+                del tweets[self.page_size:]
+            tweets = list(tweets)
+
+        items = "".join(
+            f"<item><title><![CDATA[Synthetic tweet {tweet_id} from {handle} about topic {tweet_id % 97}]]></title>"
+            f"<description><![CDATA[Synthetic tweet {tweet_id}]]></description>"
+            f"<pubDate>{email.utils.formatdate(usegmt=True)}</pubDate>"
+            f"<guid isPermaLink=\"false\">https://x.com/{handle}/status/{tweet_id}</guid>"
+            f"<link>https://x.com/{handle}/status/{tweet_id}</link></item>"
+            for tweet_id in tweets
+        )
+        return (f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                f"<title>Twitter @{handle}</title><link>https://x.com/{handle}</link>{items}</channel></rss>").encode()
+
+
+class FakeTwitter(FakeHandler):
+    """Accepts POST /2/tweets like the v2 API, with rate-limit headers"""
+    ids = itertools.count(1)
+
+    def do_POST(self):
+        payload = self.read_json()
+        if self.delay_or_fail():
+            return
+        body = json.dumps({"data": {"id": str(next(self.ids)), "text": payload.get("text", "")}}).encode()
+        headers = [("x-rate-limit-limit", "100000"), ("x-rate-limit-remaining", "99999"),
+                   ("x-rate-limit-reset", str(int(time.time()) + 900))]
+        self.send_body(201, body, "application/json", headers)
+
+
+class FakeAnthropic(FakeHandler):
+    """Answers POST /v1/messages with a canned reply and realistic usage numbers"""
+    replies = ["Bold claim, where's the data?", "Who pays for this, again?", "Cool demo. Ship it to users next.",
+               "This aged well.", "Interesting, but what about the second order effects?"]
+
+    def do_POST(self):
+        params = self.read_json()
+        if self.delay_or_fail():
+            return
+        body = json.dumps({
+            "id": "msg_fake", "type": "message", "role": "assistant", "model": params.get("model", ""),
+            "stop_reason": "end_turn", "stop_sequence": None,
+            "content": [{"type": "text", "text": random.choice(self.replies)}],
+            "usage": {"input_tokens": 40, "output_tokens": 12,
+                      "cache_read_input_tokens": 180, "cache_creation_input_tokens": 0}
+        }).encode()
+        self.send_body(200, body, "application/json")
+
+
+def configure(handler, **options):
+    """A subclass of `handler` with the given class attributes overridden"""
+    return type(handler.__name__, (handler,), options)
+
+
+def start(handler, port=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve_all(config, ready):
+    """Run the three fakes until killed, sending their base URLs through `ready` (a Queue)"""
+    servers = {
+        "rsshub": start(configure(FakeRSSHub, **config.get("rsshub", {}))),
+        "twitter": start(configure(FakeTwitter, **config.get("twitter", {}))),
+        "anthropic": start(configure(FakeAnthropic, **config.get("anthropic", {}))),
+    }
+    ready.put({name: f"http://127.0.0.1:{server.server_address[1]}" for name, server in servers.items()})
+    threading.Event().wait()
@@ -1,4 +1,5 @@
 import os
+import sys
 import subprocess
 import random
 import time
@@ -119,10 +120,10 @@ def get_twitter_cookies(username, password):
         finally:
             browser_context.close()
 
-def redeploy_rsshub(username, password, twitter_cookie, project_id):
+def redeploy_rsshub(username, password, twitter_cookie, project_id, service="rsshub"):
     # Build the deployment command with the new cookie string.
     command = [
-        "gcloud", "run", "deploy", "rsshub",
+        "gcloud", "run", "deploy", service,
         "--image", f"gcr.io/{project_id}/rsshub",
         "--platform", "managed",
         "--region", "us-central1",
@@ -138,8 +139,10 @@ def redeploy_rsshub(username, password, twitter_cookie, project_id):
         print("Error in redeployment:")
         print(result.stdout)
         print(result.stderr)
+    return result.returncode == 0
 
-def main():
+def main(service="rsshub"):
+    """Fetch fresh cookies and redeploy an RSSHub service with them, returns whether it worked"""
     # Read credentials and project ID from environment variables
     username = os.getenv("TWITTER_USERNAME")
     password = os.getenv("TWITTER_PASSWORD")
@@ -147,7 +150,7 @@ def main():
 
     if not username or not password or not project_id:
         print("Missing TWITTER_USERNAME, TWITTER_PASSWORD, or YOUR_PROJECT_ID environment variables.")
-        return
+        return False
 
     print("Fetching new Twitter cookies...")
     cookies = get_twitter_cookies(username, password)
@@ -157,7 +160,7 @@ def main():
     print("New Twitter cookie:", twitter_cookie)
     
     print("Redeploying RSSHub with updated cookie...")
-    redeploy_rsshub(username, password, twitter_cookie, project_id)
+    return redeploy_rsshub(username, password, twitter_cookie, project_id, service)
 
 if __name__ == "__main__":
-    main()
+    raise SystemExit(0 if main(*sys.argv[1:2]) else 1)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class CookieRefreshService:
+    """Runs cookie refreshes in the background, one at a time
+
+    `request()` can be called from any thread, as often as failures happen.
+    Requests arriving within `debounce` seconds of each other, or while a
+    refresh is running, coalesce into a single refresh, and no new refresh
+    starts within `cooldown` seconds of the last one finishing.
+
+    `refresh` is a blocking callable returning whether it worked; it runs on
+    the service's own thread so polling carries on and a minutes-long browser
+    session doesn't take a thread other blocking work needs. After `max_failures` failed
+    refreshes in a row the circuit opens and requests are ignored for
+    `open_duration` seconds, then a single trial refresh is allowed
+    (half-open) which closes the circuit again if it succeeds.
+    """
+
+    def __init__(self, refresh, debounce=30, cooldown=30 * 60, max_failures=3, open_duration=6 * 60 * 60):
+        self.refresh = refresh
+        self.debounce = debounce
+        self.cooldown = cooldown
+        self.max_failures = max_failures
+        self.open_duration = open_duration
+        self.loop = None
+        self.task = None
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.last_finished = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cookie-refresh")
+        self.stats = {"requested": 0, "coalesced": 0, "suppressed": 0, "succeeded": 0, "failed": 0}
+
+    def bind(self, loop=None):
+        """Attach to the event loop refreshes should be scheduled on"""
+        self.loop = loop or asyncio.get_running_loop()
+
+    def request(self, reason=""):
+        """Ask for a refresh, thread-safe and non-blocking"""
+        if self.loop is None:
+            logger.warning(f"Cookie refresh requested before the service was bound to a loop ({reason})")
+            return
+        self.loop.call_soon_threadsafe(self._request, reason)
+
+    def _request(self, reason):
+        now = time.monotonic()
+        self.stats["requested"] += 1
+
+        if self.task is not None and not self.task.done():
+            self.stats["coalesced"] += 1
+            return
+
+        if self.state == "open":
+            if now - self.opened_at < self.open_duration:
+                self.stats["suppressed"] += 1
+                return
+            self.state = "half_open"
+            logger.info("🍪 Cookie refresh circuit half-open, allowing one trial refresh")
+        elif self.last_finished is not None and now - self.last_finished < self.cooldown:
+            self.stats["suppressed"] += 1
+            logger.debug(f"Cookie refresh cooling down ({reason})")
+            return
+
+        logger.warning(f"⚠️ RSSHub failure detected ({reason}). Refreshing cookies in the background...")
+        self.task = asyncio.ensure_future(self._run(), loop=self.loop)
+
+    async def _run(self):
+        # Let the rest of a burst of failures arrive and coalesce first
+        await asyncio.sleep(self.debounce)
+        try:
+            ok = await self.loop.run_in_executor(self.executor, self.refresh)
+        except Exception as e:
+            logger.error(f"❌ Failed to refresh cookies: {e}")
+            ok = False
+        self.last_finished = time.monotonic()
+
+        if ok:
+            self.stats["succeeded"] += 1
+            self.failures = 0
+            self.state = "closed"
+            logger.info("✅ Successfully refreshed cookies")
+        else:
+            self.stats["failed"] += 1
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.max_failures:
+                self.state = "open"
+                self.opened_at = self.last_finished
+                logger.error(f"❌ Cookie refresh failed {self.failures} times in a row, "
+                             f"pausing refreshes for {self.open_duration/3600:.1f}h")
+            else:
+                logger.error(f"❌ Cookie refresh failed ({self.failures}/{self.max_failures})")
+
+    @property
+    def refreshing(self):
+        return self.task is not None and not self.task.done()
+
+    def metrics(self):
+        return dict(self.stats, state=self.state, failures=self.failures, refreshing=self.refreshing)
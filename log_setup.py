@@ -0,0 +1,116 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import time
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# LogRecord attributes, anything else on a record came in through `extra=`
+RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, fields passed as `extra`, exception"""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in RECORD_FIELDS and not name.startswith("_"):
+                entry[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread without ever waiting
+
+    The message is merged with its arguments here (the listener might
+    otherwise see them mutated) and tracebacks are rendered to text, but
+    formatting, encoding and I/O all happen on the listener's thread. When
+    the queue is full the record is dropped and counted instead.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.traceback_formatter = logging.Formatter()
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or self.traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def parse_levels(spec):
+    """{"logger": level} from "name=LEVEL, ..." (e.g. "rss_parser=DEBUG,cookie_service=WARNING")"""
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(log_file, level="INFO", fmt="text", max_bytes=10 * 1024 * 1024, backups=5,
+                      levels=None, queue_size=10000, console=True):
+    """Route all logging through a queue to a background thread writing `log_file` (and the console)
+
+    The file rotates at `max_bytes` keeping `backups` old files (0 disables
+    rotation). `fmt` is "text" or "json" (JSON lines). `levels` maps logger
+    names to their own levels. Does nothing if the root logger already has
+    handlers, like basicConfig. Returns the running QueueListener, or None.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+    if max_bytes:
+        file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backups,
+                                                            encoding="utf-8")
+    else:
+        file_handler = logging.FileHandler(log_file, encoding="utf-8")
+    handlers = [file_handler] + ([logging.StreamHandler()] if console else [])
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    root.addHandler(NonBlockingQueueHandler(log_queue))
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    for name, module_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    listener.start()
+    # Write out whatever is still queued on exit
+    atexit.register(stop_listener, listener)
+    return listener
+
+
+def stop_listener(listener):
+    """Flush the queue and stop the writer thread, safe to call more than once"""
+    if listener._thread is not None:
+        listener.stop()
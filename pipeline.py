@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """One pipeline stage: `workers` coroutines draining a bounded input queue
+
+    Items are argument tuples for `handler`, a coroutine that returns an
+    iterable of argument tuples for the next stage (or None). Putting into a
+    full queue waits, so a slow stage pushes back on the ones before it
+    instead of letting work pile up in memory.
+
+    `admit` is an optional admission check run before the handler; rejected
+    items go to `on_reject` instead. `delay` is a (min, max) range for a
+    random gap between the starts of consecutive items, kept across all
+    workers however many items are queued. `observe` is an optional
+    callable given each handler call's duration in seconds.
+    """
+
+    def __init__(self, name, handler, workers=1, queue_size=100, admit=None, on_reject=None, delay=None,
+                 observe=None):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.admit = admit
+        self.on_reject = on_reject
+        self.delay = delay
+        self.next_start = 0.0  # Earliest monotonic time the next item may start
+        self.observe = observe
+        self.next = None
+        self.tasks = []
+        self.stats = {"processed": 0, "failed": 0, "rejected": 0}
+
+    async def put(self, item):
+        await self.queue.put(item)
+
+    async def join(self):
+        """Wait until every item queued so far has been handled"""
+        await self.queue.join()
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                if self.admit is not None and not self.admit(*item):
+                    self.stats["rejected"] += 1
+                    if self.on_reject is not None:
+                        await self.on_reject(*item)
+                    continue
+
+                if self.delay:
+                    await self._wait_for_slot()
+                started = time.perf_counter()
+                outputs = await self.handler(*item)
+                if self.observe is not None:
+                    self.observe(time.perf_counter() - started)
+                self.stats["processed"] += 1
+                if self.next is not None:
+                    for output in outputs or ():
+                        await self.next.put(output)
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"❌ {self.name} stage failed on {item[0]}: {e}")
+                logger.exception("Detailed error:")
+            finally:
+                self.queue.task_done()
+
+    async def _wait_for_slot(self):
+        """Reserve the next start time, `delay` after the previous item's, and wait for it"""
+        now = time.monotonic()
+        start = max(now, self.next_start)
+        self.next_start = start + random.uniform(*self.delay)
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    def metrics(self):
+        return dict(self.stats, queued=self.queue.qsize(), workers=self.workers)
+
+
+class Pipeline:
+    """Stages chained in order, each feeding the next one's queue"""
+
+    def __init__(self, stages):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage, following in zip(stages, stages[1:]):
+            stage.next = following
+        self.first = stages[0]
+        self.running = False
+
+    def __getitem__(self, name):
+        return self.stages[name]
+
+    async def submit(self, *item):
+        """Queue work for the first stage, waiting while it's full"""
+        await self.first.put(item)
+
+    async def join(self, *names):
+        """Wait for the named stages to drain, in order (all stages by default)"""
+        for name in names or self.stages:
+            await self.stages[name].join()
+
+    def start(self):
+        if not self.running:
+            for stage in self.stages.values():
+                stage.start()
+            self.running = True
+
+    async def stop(self):
+        for stage in self.stages.values():
+            await stage.stop()
+        self.running = False
+
+    def metrics(self):
+        return {name: stage.metrics() for name, stage in self.stages.items()}
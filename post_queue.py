@@ -0,0 +1,68 @@
+import time
+
+
+class PostQueue:
+    """Persistent FIFO of generated replies waiting for a posting permit
+
+    `data` is a plain dict so it can be a persisted state document:
+    {"pending": [{"user", "tweet_id", "reply", "queued", "expires"}, ...],
+     "blocked_until": epoch seconds Twitter told us to wait until}.
+    Replies older than `ttl` are stale and dropped rather than posted late.
+    """
+
+    def __init__(self, data=None, ttl=6 * 60 * 60, max_size=100, on_change=None):
+        self.data = {} if data is None else data
+        self.data.setdefault("pending", [])
+        self.data.setdefault("blocked_until", 0.0)
+        self.ttl = ttl
+        self.max_size = max_size
+        self.on_change = on_change or (lambda: None)
+
+    @property
+    def pending(self):
+        return self.data["pending"]
+
+    def push(self, user, tweet_id, reply, now=None):
+        """Queue a reply, returns the oldest entry if it had to make room"""
+        now = time.time() if now is None else now
+        self.pending.append({"user": user, "tweet_id": str(tweet_id), "reply": reply,
+                             "queued": now, "expires": now + self.ttl})
+        dropped = self.pending.pop(0) if len(self.pending) > self.max_size else None
+        self.on_change()
+        return dropped
+
+    def peek(self):
+        return self.pending[0] if self.pending else None
+
+    def pop(self):
+        entry = self.pending.pop(0)
+        self.on_change()
+        return entry
+
+    def drop_expired(self, now=None):
+        """Remove and return replies that went stale while waiting"""
+        now = time.time() if now is None else now
+        expired = [entry for entry in self.pending if entry["expires"] <= now]
+        if expired:
+            self.data["pending"] = [entry for entry in self.pending if entry["expires"] > now]
+            self.on_change()
+        return expired
+
+    def time_until_expiry(self, now=None):
+        """Seconds until the next queued reply goes stale (inf when empty)"""
+        now = time.time() if now is None else now
+        return min((entry["expires"] - now for entry in self.pending), default=float("inf"))
+
+    def block_until(self, reset):
+        """Hold all sends until `reset` (epoch seconds), e.g. from x-rate-limit-reset"""
+        if reset > self.data["blocked_until"]:
+            self.data["blocked_until"] = float(reset)
+            self.on_change()
+
+    def blocked_for(self, now=None):
+        """Seconds left before Twitter accepts another post (0 if not blocked)"""
+        now = time.time() if now is None else now
+        return max(0.0, self.data["blocked_until"] - now)
+
+    def __len__(self):
+        return len(self.pending)
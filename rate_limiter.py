@@ -0,0 +1,102 @@
+import random
+import time
+from collections import deque
+
+
+def backoff_delay(attempt, base=2.0, cap=300.0, rng=random):
+    """Exponential backoff with full jitter: uniform in [0, min(cap, base * 2**attempt)]"""
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class SlidingWindowLimiter:
+    """Allows at most `limit` permits in any rolling `window` seconds
+
+    Only the timestamps of the last `limit` permits are kept. Expired ones are
+    dropped from the left as time passes, so checks and consumes are amortized
+    O(1) and the state never grows past `limit` floats. The oldest kept
+    timestamp tells exactly when the next permit opens up.
+    """
+
+    def __init__(self, limit, window, timestamps=()):
+        self.limit = limit
+        self.window = window
+        self.timestamps = deque(sorted(timestamps)[-limit:], maxlen=limit)
+
+    def _prune(self, now):
+        cutoff = now - self.window
+        while self.timestamps and self.timestamps[0] <= cutoff:
+            self.timestamps.popleft()
+
+    def used(self, now=None):
+        """Number of permits consumed in the current window"""
+        self._prune(time.time() if now is None else now)
+        return len(self.timestamps)
+
+    def remaining(self, now=None):
+        return self.limit - self.used(now)
+
+    def can_acquire(self, now=None):
+        return self.used(now) < self.limit
+
+    def consume(self, now=None):
+        """Record a permit, whether or not one was available"""
+        now = time.time() if now is None else now
+        self._prune(now)
+        self.timestamps.append(now)
+
+    def try_acquire(self, now=None):
+        """Consume a permit if one is available, returns whether it was"""
+        now = time.time() if now is None else now
+        if not self.can_acquire(now):
+            return False
+        self.timestamps.append(now)
+        return True
+
+    def time_until_available(self, now=None, count=1):
+        """Seconds until `count` permits are free at once (0 if they are now)
+
+        Infinite when `count` exceeds the limit.
+        """
+        now = time.time() if now is None else now
+        short = count - self.remaining(now)
+        if short <= 0:
+            return 0.0
+        if count > self.limit:
+            return float("inf")
+        # Permits free up as the oldest timestamps leave the window
+        return max(0.0, self.timestamps[short - 1] + self.window - now)
+
+    def state(self):
+        return [round(ts, 3) for ts in self.timestamps]
+
+
+class RateLimiter:
+    """A named group of sliding-window limits that can be checked together"""
+
+    def __init__(self, limiters):
+        self.limiters = limiters
+
+    def __getitem__(self, name):
+        return self.limiters[name]
+
+    def can_acquire(self, *names, now=None):
+        return all(self.limiters[name].can_acquire(now) for name in names)
+
+    def consume(self, *names, now=None):
+        for name in names:
+            self.limiters[name].consume(now)
+
+    def time_until_available(self, *names, now=None, count=1):
+        """Seconds until every named limit has `count` permits available"""
+        return max(self.limiters[name].time_until_available(now, count) for name in names)
+
+    def state(self):
+        """Compact, JSON-serializable state ({name: [timestamps]})"""
+        return {name: limiter.state() for name, limiter in self.limiters.items()}
+
+    def load(self, state):
+        """Restore timestamps saved by state(), ignoring unknown names"""
+        for name, timestamps in state.items():
+            if name in self.limiters:
+                limiter = self.limiters[name]
+                limiter.timestamps = deque(sorted(timestamps)[-limiter.limit:], maxlen=limiter.limit)
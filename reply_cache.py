@@ -0,0 +1,90 @@
+import hashlib
+import re
+import time
+
+URL_RE = re.compile(r"https?://\S+")
+RETWEET_RE = re.compile(r"\brt @\w+:?")
+NON_WORD_RE = re.compile(r"[^\w{}]+")
+
+
+def normalize_context(context, user=None):
+    """Reduce a prompt context to the parts that decide the reply
+
+    Case, URLs, retweet prefixes, punctuation and the author's handle are
+    dropped, so cross-posts, retweets and every "<user> posted a picture"
+    prompt collapse to the same key.
+    """
+    text = context.lower()
+    if user:
+        text = re.sub(rf"@?\b{re.escape(user.lower())}\b", "{user}", text)
+    text = URL_RE.sub(" ", text)
+    text = RETWEET_RE.sub(" ", text)
+    return NON_WORD_RE.sub(" ", text).strip()
+
+
+def context_key(context, user=None):
+    return hashlib.sha256(normalize_context(context, user).encode()).hexdigest()
+
+
+class ReplyCache:
+    """TTL + LRU cache of reply drafts keyed by a hash of the normalized prompt context
+
+    Each entry keeps every draft generated for a context, best first. A hit
+    hands out the next draft, and each draft can be served `draft_uses` times,
+    so repeated contexts rotate through what was already paid for before
+    another generation is needed. With the default of 1 only alternates that
+    were never posted are served: posting the same text twice is spam and
+    gets Twitter's duplicate-content 403.
+
+    `entries` is a plain dict (insertion order doubles as LRU order) so it can
+    be a persisted state document; `on_change` is called whenever it changes.
+    """
+
+    def __init__(self, max_entries=500, ttl=6 * 60 * 60, draft_uses=1, entries=None, on_change=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.draft_uses = draft_uses
+        self.entries = {} if entries is None else entries
+        self.on_change = on_change or (lambda: None)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, context, user=None, now=None):
+        """Return a cached draft for this context, or None on a miss"""
+        now = time.time() if now is None else now
+        key = context_key(context, user)
+        entry = self.entries.pop(key, None)
+        if entry is None or entry["expires"] <= now or entry["uses"] >= len(entry["drafts"]) * self.draft_uses:
+            if entry is not None:
+                self.on_change()
+            self.misses += 1
+            return None
+
+        draft = entry["drafts"][entry["uses"] % len(entry["drafts"])]
+        entry["uses"] += 1
+        self.entries[key] = entry  # Re-insert as most recently used
+        self.hits += 1
+        self.on_change()
+        return draft
+
+    def put(self, context, drafts, user=None, used=1, now=None):
+        """Store the drafts generated for a context (best first), `used` already served
+
+        Nothing is stored when no use is left, e.g. a single draft that was just posted.
+        """
+        if len(drafts) * self.draft_uses <= used:
+            return
+        now = time.time() if now is None else now
+        key = context_key(context, user)
+        self.entries.pop(key, None)
+        self.entries[key] = {"drafts": list(drafts), "uses": used, "expires": now + self.ttl}
+
+        # Drop expired entries first, then least recently used ones
+        for stale in [k for k, entry in self.entries.items() if entry["expires"] <= now]:
+            del self.entries[stale]
+        while len(self.entries) > self.max_entries:
+            del self.entries[next(iter(self.entries))]
+        self.on_change()
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,75 @@
+import io
+import re
+import xml.etree.ElementTree as ET
+
+# Author and tweet ID from a status link (works with both twitter.com and x.com links)
+STATUS_RE = re.compile(r"(?:twitter|x)\.com/(\w+)/status/(\d+)")
+
+
+def parse_rsshub_feed(content, user=None, stop_at=None):
+    """Stream tweet entries out of an RSSHub feed
+
+    RSSHub's Twitter routes return plain RSS 2.0, newest item first, so items
+    are read one at a time with iterparse, freed as soon as they're read, and
+    parsing stops at the first item by `user` whose ID is at or below
+    `stop_at` (their last seen tweet). Items by other authors, like
+    retweets of older tweets, never stop the parse, and neither does the
+    first item since it may be a pinned, older tweet.
+
+    Entries are {"id", "author", "title", "link", "published"}. Raises
+    ValueError if the document isn't a well-formed RSS feed.
+    """
+    entries = []
+    items = 0
+    user = (user or "").lower()
+    try:
+        events = ET.iterparse(io.BytesIO(content), events=("start", "end"))
+        _, root = next(events)
+        if root.tag != "rss":
+            raise ValueError(f"Not an RSS feed (<{root.tag}>)")
+
+        for event, element in events:
+            if event != "end" or element.tag != "item":
+                continue
+            items += 1
+            link = element.findtext("link") or ""
+            title = element.findtext("title") or ""
+            published = element.findtext("pubDate") or ""
+            element.clear()  # Only the compact record below is kept
+
+            match = STATUS_RE.search(link)
+            if not match:
+                continue
+            author, tweet_id = match.groups()
+            if stop_at is not None and items > 1 and author.lower() == user and int(tweet_id) <= stop_at:
+                break
+            entries.append({"id": tweet_id, "author": author, "title": title, "link": link, "published": published})
+    except (ET.ParseError, StopIteration) as e:
+        raise ValueError(f"Malformed feed: {e}") from e
+    return entries
+
+
+def parse_feed_fallback(content, response_headers=None):
+    """Parse any feed format with feedparser, for what parse_rsshub_feed rejects
+
+    Returns the same entry records, or None if the document isn't a feed at all.
+    """
+    import feedparser  # Slow to import and rarely needed
+    feed = feedparser.parse(content, response_headers=response_headers or {})
+    if not feed.entries and (feed.get("bozo") or not feed.get("version")):
+        return None
+
+    entries = []
+    for entry in feed.entries:
+        link = entry.get("link", "")
+        match = STATUS_RE.search(link)
+        if match:
+            author, tweet_id = match.groups()
+            entries.append({
+                "id": tweet_id,
+                "author": author,
+                "title": entry.get("title", ""),
+                "link": link,
+                "published": entry.get("published", "")
+            })
+    return entries
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import Counter, deque
+
+# Outcome kinds, and which of them count against the backend
+OK = "ok"                      # 200 with entries, or 304
+EMPTY = "empty"                # 200 with a valid but empty feed, a quiet user
+RATE_LIMITED = "rate_limited"  # 429
+AUTH = "auth"                  # 401/403, RSSHub's Twitter cookies are likely stale
+SERVER = "server"              # 5xx
+CONNECTION = "connection"      # Timeouts, refused or reset connections
+PARSE = "parse"                # 200 that isn't a usable feed
+CLIENT = "client"              # Other 4xx, e.g. an unknown user, not the backend's fault
+ERRORS = {RATE_LIMITED, AUTH, SERVER, CONNECTION, PARSE}
+
+
+def classify_status(status):
+    """Outcome kind for an HTTP status from RSSHub"""
+    if status in (200, 304):
+        return OK
+    if status == 429:
+        return RATE_LIMITED
+    if status in (401, 403):
+        return AUTH
+    if status >= 500:
+        return SERVER
+    return CLIENT
+
+
+class BackendHealth:
+    """Rolling error rate and circuit breaker for one RSSHub backend
+
+    Outcomes from the last `window` seconds are kept. Once at least
+    `min_requests` are in the window and the share of errors reaches
+    `error_threshold` (or `max_consecutive` errors happen in a row), the
+    circuit opens and requests are refused for `open_duration` seconds,
+    doubled for every failed trial up to `max_open_duration`. Then it's
+    half-open: one trial request goes through, closing the circuit if it
+    succeeds. Empty feeds and client errors are not failures.
+
+    Outcomes are recorded from fetch threads, so access is locked.
+    """
+
+    def __init__(self, window=15 * 60, min_requests=5, error_threshold=0.5, max_consecutive=5,
+                 open_duration=5 * 60, max_open_duration=60 * 60):
+        self.window = window
+        self.min_requests = min_requests
+        self.error_threshold = error_threshold
+        self.max_consecutive = max_consecutive
+        self.open_duration = open_duration
+        self.max_open_duration = max_open_duration
+        self.outcomes = deque()  # (timestamp, kind)
+        self.state = "closed"
+        self.consecutive_errors = 0
+        self.opened_at = None
+        self.current_open_duration = open_duration
+        self.trial_in_flight = False
+        self.totals = Counter()
+        self.lock = threading.Lock()
+
+    def _prune(self, now):
+        cutoff = now - self.window
+        while self.outcomes and self.outcomes[0][0] <= cutoff:
+            self.outcomes.popleft()
+
+    def available(self, now=None):
+        """Whether allow_request would let a request through, without claiming a trial"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.state == "open":
+                return now - self.opened_at >= self.current_open_duration
+            return self.state == "closed" or not self.trial_in_flight
+
+    def allow_request(self, now=None):
+        """Whether a request may go to this backend now (claims the trial when half-open)"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open":
+                if now - self.opened_at < self.current_open_duration:
+                    return False
+                self.state = "half_open"
+            if self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record(self, kind, now=None):
+        """Record an outcome, returns True if it just opened the circuit"""
+        now = time.time() if now is None else now
+        with self.lock:
+            self.totals[kind] += 1
+            self.outcomes.append((now, kind))
+            self._prune(now)
+            failed = kind in ERRORS
+            self.consecutive_errors = self.consecutive_errors + 1 if failed else 0
+
+            if self.state == "half_open":
+                self.trial_in_flight = False
+                if failed:
+                    self.current_open_duration = min(self.current_open_duration * 2, self.max_open_duration)
+                    return self._open(now)
+                self.state = "closed"
+                self.current_open_duration = self.open_duration
+                self.outcomes.clear()
+                return False
+
+            if self.state == "closed" and failed and (
+                self.consecutive_errors >= self.max_consecutive
+                or (len(self.outcomes) >= self.min_requests and self._error_rate() >= self.error_threshold)
+            ):
+                return self._open(now)
+            return False
+
+    def _open(self, now):
+        self.state = "open"
+        self.opened_at = now
+        return True
+
+    def _error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for _, kind in self.outcomes if kind in ERRORS) / len(self.outcomes)
+
+    def error_rate(self, now=None):
+        """Share of errors among the outcomes in the rolling window"""
+        with self.lock:
+            self._prune(time.time() if now is None else now)
+            return self._error_rate()
+
+    def time_until_retry(self, now=None):
+        """Seconds until the circuit lets a trial request through (0 unless open)"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.state != "open":
+                return 0.0
+            return max(0.0, self.opened_at + self.current_open_duration - now)
+
+    def metrics(self, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            self._prune(now)
+            return {
+                "state": self.state,
+                "error_rate": round(self._error_rate(), 3),
+                "window_requests": len(self.outcomes),
+                "window_by_kind": dict(Counter(kind for _, kind in self.outcomes)),
+                "totals": dict(self.totals)
+            }
@@ -0,0 +1,107 @@
+import threading
+
+from rsshub_health import ERRORS, BackendHealth
+
+
+class Backend:
+    """One RSSHub instance: its base URL, health and load
+
+    `service` names the deployment that gets redeployed with fresh cookies
+    when this instance's cookies go stale; `refresher` is the cookie refresh
+    service doing that for it.
+    """
+
+    def __init__(self, url, service="rsshub", health=None, refresher=None):
+        self.url = url
+        self.service = service
+        self.health = health or BackendHealth()
+        self.refresher = refresher
+        self.outstanding = 0
+        self.latency = None  # Exponentially weighted moving average, seconds
+        self.requests = 0
+
+    def load(self):
+        """Routing cost: expected wait with the requests already in flight
+
+        Backends without a latency sample yet cost nothing, so each one gets
+        tried early.
+        """
+        return (self.outstanding + 1) * (self.latency or 0.0)
+
+    def metrics(self):
+        return {
+            "url": self.url,
+            "service": self.service,
+            "outstanding": self.outstanding,
+            "latency": None if self.latency is None else round(self.latency, 3),
+            "requests": self.requests,
+            **self.health.metrics()
+        }
+
+
+class BackendPool:
+    """Routes feed requests over several RSSHub instances
+
+    `acquire` picks the healthy backend with the lowest load (requests in
+    flight weighted by its recent latency), skipping backends whose circuit
+    is open, and `release` records how the request went. Callers fail over by
+    acquiring again with the backends already tried excluded.
+    """
+
+    def __init__(self, backends, latency_alpha=0.3):
+        self.backends = list(backends)
+        self.latency_alpha = latency_alpha
+        self.lock = threading.Lock()
+
+    def __iter__(self):
+        return iter(self.backends)
+
+    def __len__(self):
+        return len(self.backends)
+
+    def acquire(self, exclude=(), now=None):
+        """Claim the best available backend, or None if every one is excluded or down"""
+        with self.lock:
+            candidates = sorted((b for b in self.backends if b not in exclude), key=Backend.load)
+            for backend in candidates:
+                if backend.health.allow_request(now):
+                    backend.outstanding += 1
+                    backend.requests += 1
+                    return backend
+            return None
+
+    def release(self, backend, kind, latency, now=None):
+        """Record a finished request, returns True if it opened the backend's circuit"""
+        with self.lock:
+            backend.outstanding -= 1
+            if kind not in ERRORS:
+                # Failures are often fast (refused connections), don't let them look attractive
+                if backend.latency is None:
+                    backend.latency = latency
+                else:
+                    backend.latency += self.latency_alpha * (latency - backend.latency)
+        return backend.health.record(kind, now)
+
+    def time_until_retry(self, now=None):
+        """Seconds until some backend takes requests again (0 if one does now)"""
+        return min((backend.health.time_until_retry(now) for backend in self.backends), default=0.0)
+
+    def metrics(self):
+        return [backend.metrics() for backend in self.backends]
+
+
+def parse_backends(spec, default_service="rsshub"):
+    """Parse "[service=]url, ..." into (url, service) pairs
+
+    e.g. "rsshub=https://a.run.app/twitter/user/, rsshub-2=https://b.run.app/twitter/user/".
+    """
+    backends = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        service, sep, url = item.partition("=")
+        if not sep or "://" in service:
+            service, url = default_service, item
+        backends.append((url.strip(), service.strip()))
+    return backends
@@ -0,0 +1,100 @@
+import heapq
+import math
+import random
+import time
+
+
+class AdaptiveScheduler:
+    """Picks which users to poll next from their observed posting rates
+
+    Each user's posting rate (tweets per second) gets a Gamma posterior built
+    from exponentially decayed poll results: shape = new tweets found + prior
+    events, rate = time covered by those polls + prior exposure. Selection
+    draws a rate from every posterior (Thompson sampling) and ranks users by
+    the chance of at least one new tweet since their last check,
+    1 - exp(-rate * gap). Prolific and long-unchecked accounts both move up,
+    while quiet accounts still get explored now and then.
+    """
+
+    def __init__(self, half_life=7 * 24 * 60 * 60, prior_events=1.0, prior_exposure=24 * 60 * 60,
+                 default_gap=24 * 60 * 60, rng=None):
+        self.half_life = half_life            # Seconds for old observations to lose half their weight
+        self.prior_events = prior_events      # Prior: one tweet...
+        self.prior_exposure = prior_exposure  # ...per day
+        self.default_gap = default_gap        # Assumed gap for users never checked
+        self.rng = rng or random.Random()
+        self.stats = {}
+
+    def _gap(self, user, now):
+        last_checked = self.stats.get(user, {}).get("last_checked")
+        return self.default_gap if last_checked is None else max(0.0, now - last_checked)
+
+    def _posterior(self, user):
+        stats = self.stats.get(user, {})
+        return (stats.get("events", 0.0) + self.prior_events,
+                stats.get("exposure", 0.0) + self.prior_exposure)
+
+    def posterior_rate(self, user):
+        """Posterior mean posting rate for a user, in tweets per second"""
+        shape, rate = self._posterior(user)
+        return shape / rate
+
+    def expected_yield(self, user, now=None, rate=None):
+        """Chance that polling `user` now finds at least one new tweet"""
+        now = time.time() if now is None else now
+        rate = self.posterior_rate(user) if rate is None else rate
+        return 1 - math.exp(-rate * self._gap(user, now))
+
+    def select(self, users, k, now=None):
+        """Pick the `k` users with the highest sampled chance of a new tweet"""
+        now = time.time() if now is None else now
+
+        def sampled_yield(user):
+            shape, rate = self._posterior(user)
+            return self.expected_yield(user, now, self.rng.gammavariate(shape, 1 / rate))
+
+        return heapq.nlargest(k, users, key=sampled_yield)
+
+    def record_poll(self, user, new_tweets, now=None):
+        """Fold one poll's result into the user's decayed counts"""
+        now = time.time() if now is None else now
+        stats = self.stats.setdefault(user, {"events": 0.0, "exposure": 0.0, "last_checked": None, "updated": now})
+        gap = self._gap(user, now)
+        decay = 0.5 ** (max(0.0, now - stats["updated"]) / self.half_life)
+        stats["events"] = stats["events"] * decay + new_tweets
+        stats["exposure"] = stats["exposure"] * decay + gap
+        stats["last_checked"] = now
+        stats["updated"] = now
+        return stats
+
+    def seed(self, user, new_tweets, polls, now=None):
+        """Initialise a user with no scheduler history from poll_stats totals"""
+        if user in self.stats or polls <= 0:
+            return
+        now = time.time() if now is None else now
+        self.stats[user] = {
+            "events": float(new_tweets),
+            "exposure": float(polls * self.default_gap),
+            "last_checked": None,
+            "updated": now
+        }
+
+    def metrics(self, users, selected=(), now=None):
+        """Expected-yield summary for the monitored users and the last selection"""
+        now = time.time() if now is None else now
+        yields = {user: self.expected_yield(user, now) for user in users}
+        mean_yield = sum(yields.values()) / len(yields) if yields else 0.0
+        top = heapq.nlargest(5, yields.items(), key=lambda item: item[1])
+        return {
+            "users": len(yields),
+            "selected_expected_new": sum(yields[user] for user in selected if user in yields),
+            "uniform_expected_new": mean_yield * len(selected),
+            "mean_expected_yield": mean_yield,
+            "top_users": [{"user": user, "expected_yield": round(value, 3)} for user, value in top]
+        }
+
+    def state(self):
+        return self.stats
+
+    def load(self, state):
+        self.stats = {user: dict(stats) for user, stats in state.items()}
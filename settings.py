@@ -0,0 +1,39 @@
+import os
+
+# Environment variables the bot can't run without
+REQUIRED_ENV_VARS = [
+    "TWITTER_API_KEY",
+    "TWITTER_API_SECRET",
+    "TWITTER_ACCESS_TOKEN",
+    "TWITTER_ACCESS_SECRET",
+    "ANTHROPIC_API_KEY",
+    "RSSHUB_URL",
+    "TWITTER_USERNAME",
+    "TWITTER_PASSWORD"
+]
+
+
+class Settings:
+    """Credentials and endpoints from the environment
+
+    Reading them is cheap and never fails; `require` checks the ones a code
+    path actually needs, when it first needs them, so importing the bot works
+    offline and without a complete .env.
+    """
+
+    def __init__(self, environ=None):
+        env = os.environ if environ is None else environ
+        self.values = {name: env.get(name) for name in REQUIRED_ENV_VARS}
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def missing(self, *names):
+        """Names (all required ones by default) that aren't set"""
+        return [name for name in names or REQUIRED_ENV_VARS if not self.values.get(name)]
+
+    def require(self, *names):
+        """Raise SystemExit naming the missing variables, if any"""
+        missing = self.missing(*names)
+        if missing:
+            raise SystemExit(f"Missing required environment variables: {', '.join(missing)}")
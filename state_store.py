@@ -0,0 +1,398 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# The process umask, read once at import (os.umask can only be read by setting it)
+UMASK = os.umask(0o022)
+os.umask(UMASK)
+
+
+def file_mode(path):
+    """Permissions for a rewritten `path`: the existing file's, or the umask default for a new file"""
+    try:
+        return os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+
+def atomic_write_json(path, data):
+    """Write JSON to a temp file next to `path` and rename it into place
+
+    mkstemp creates the temp file as 0600, so it gets the target's mode
+    before the rename instead of silently tightening the file's permissions.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, file_mode(path))
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def seen_marks_from_tweets(tweets):
+    """Derive per-user high-water marks from the legacy {user: {tweet_id: info}} layout"""
+    marks = {}
+    for user, user_tweets in tweets.items():
+        if not user_tweets:
+            continue
+        last_id = max(user_tweets, key=int)
+        replied = [tweet_id for tweet_id, info in user_tweets.items() if info.get("replied")]
+        marks[user] = {
+            "last_id": last_id,
+            "timestamp": max(info.get("timestamp", "") for info in user_tweets.values()),
+            "last_replied_id": max(replied, key=int) if replied else None
+        }
+    return marks
+
+
+class JsonDocument:
+    """A JSON file kept in memory, written back only when marked dirty"""
+
+    def __init__(self, path, default_factory):
+        self.path = Path(path)
+        self.default_factory = default_factory
+        self.dirty = False
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = self._load()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    def _load(self):
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading {self.path}: {e}")
+        return self.default_factory()
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def flush(self):
+        """Persist the document if it changed since the last flush"""
+        if not self.dirty or self._data is None:
+            return False
+        try:
+            atomic_write_json(self.path, self._data)
+            self.dirty = False
+            return True
+        except Exception as e:
+            logger.error(f"Error saving {self.path}: {e}")
+            return False
+
+
+class StateStore:
+    """Process-resident bot state with batched write-behind persistence"""
+
+    def __init__(self, flush_interval=30):
+        self.flush_interval = flush_interval
+        self.documents = {}
+
+    def document(self, name, path, default_factory):
+        """Register (or return the already registered) document called `name`"""
+        if name not in self.documents:
+            self.documents[name] = JsonDocument(path, default_factory)
+        return self.documents[name]
+
+    def flush(self):
+        """Write every dirty document to disk, returns how many were written"""
+        return sum(1 for doc in self.documents.values() if doc.flush())
+
+    async def run_flusher(self):
+        """Flush dirty documents every `flush_interval` seconds until cancelled"""
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                written = self.flush()
+                if written:
+                    logger.debug(f"Flushed {written} state file(s)")
+        finally:
+            self.flush()
+
+
+class SqliteStateStore:
+    """SQLite (WAL mode) storage for seen tweet marks, replies, polls and user stats
+
+    Every lookup and insert goes through a primary key or index, so the cost
+    per poll stays O(log n) however long the history gets.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS seen_marks (
+            user TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            last_replied_id INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS replies (
+            id INTEGER PRIMARY KEY,
+            tweet_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_replies_timestamp ON replies (timestamp);
+        CREATE TABLE IF NOT EXISTS polls (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_polls_timestamp ON polls (timestamp);
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user TEXT PRIMARY KEY,
+            total_polls INTEGER NOT NULL DEFAULT 0,
+            total_tweets INTEGER NOT NULL DEFAULT 0,
+            new_tweets INTEGER NOT NULL DEFAULT 0,
+            hit_rate REAL NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS scheduler_stats (
+            user TEXT PRIMARY KEY,
+            events REAL NOT NULL,
+            exposure REAL NOT NULL,
+            last_checked REAL,
+            updated REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode, multi-statement work uses explicit transactions
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self._migrate_seen_tweets_table()
+
+    def close(self):
+        self.conn.close()
+
+    # Meta values (reset markers, migration flags)
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    # Seen tweet marks
+    def last_seen_id(self, user):
+        row = self.conn.execute("SELECT last_id FROM seen_marks WHERE user = ?", (user,)).fetchone()
+        return row[0] if row else None
+
+    def mark_tweet_as_seen(self, user, tweet_id, replied, timestamp):
+        tweet_id = int(tweet_id)
+        self.conn.execute(
+            "INSERT INTO seen_marks (user, last_id, timestamp, last_replied_id) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (user) DO UPDATE SET "
+            "last_id = MAX(last_id, excluded.last_id), "
+            "timestamp = excluded.timestamp, "
+            "last_replied_id = COALESCE(excluded.last_replied_id, last_replied_id)",
+            (user, tweet_id, timestamp, tweet_id if replied else None)
+        )
+
+    def seen_marks_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM seen_marks").fetchone()[0]
+
+    def compact_seen_marks(self, cutoff, monitored_users):
+        """Delete marks older than `cutoff` for users not in `monitored_users`
+
+        Returns (evicted, remaining).
+        """
+        stale = [
+            (user,) for user, in self.conn.execute("SELECT user FROM seen_marks WHERE timestamp < ?", (cutoff,))
+            if user not in monitored_users
+        ]
+        self.conn.executemany("DELETE FROM seen_marks WHERE user = ?", stale)
+        remaining = self.conn.execute("SELECT COUNT(*) FROM seen_marks").fetchone()[0]
+        return len(stale), remaining
+
+    def _migrate_seen_tweets_table(self):
+        """Collapse a per-tweet seen_tweets table from older databases into marks"""
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'seen_tweets'"
+        ).fetchone()
+        if not exists:
+            return
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO seen_marks (user, last_id, timestamp, last_replied_id) "
+                "SELECT user, MAX(CAST(tweet_id AS INTEGER)), MAX(timestamp), "
+                "MAX(CASE WHEN replied THEN CAST(tweet_id AS INTEGER) END) "
+                "FROM seen_tweets GROUP BY user"
+            )
+            self.conn.execute("DROP TABLE seen_tweets")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        logger.info("Migrated seen_tweets table to per-user high-water marks")
+
+    # Replies and polls
+    def add_reply(self, tweet_id, timestamp):
+        self.conn.execute("INSERT INTO replies (tweet_id, timestamp) VALUES (?, ?)", (tweet_id, timestamp))
+
+    def add_poll(self, timestamp):
+        self.conn.execute("INSERT INTO polls (timestamp) VALUES (?)", (timestamp,))
+
+    def recent_timestamps(self, table, since):
+        """Epoch timestamps of rows in `table` ("replies" or "polls") newer than `since`"""
+        if table not in ("replies", "polls"):
+            raise ValueError(f"Unknown table: {table}")
+        rows = self.conn.execute(
+            f"SELECT timestamp FROM {table} WHERE timestamp > ? ORDER BY timestamp",
+            (datetime.fromtimestamp(since).isoformat(),)
+        )
+        return [datetime.fromisoformat(timestamp).timestamp() for timestamp, in rows]
+
+    # User stats
+    def update_user_stats(self, user, found_tweets, new_tweets, now):
+        """Add one poll's results to a user's stats and return the updated stats"""
+        stats_start = self.get_meta("stats_last_reset")
+        if stats_start is None or now - datetime.fromisoformat(stats_start) > timedelta(days=30):
+            self.conn.execute("DELETE FROM user_stats")
+            self.set_meta("stats_last_reset", now.isoformat())
+
+        self.conn.execute(
+            "INSERT INTO user_stats (user, total_polls, total_tweets, new_tweets, hit_rate) "
+            "VALUES (?, 1, ?, ?, ?) "
+            "ON CONFLICT (user) DO UPDATE SET "
+            "total_polls = total_polls + 1, "
+            "total_tweets = total_tweets + excluded.total_tweets, "
+            "new_tweets = new_tweets + excluded.new_tweets, "
+            "hit_rate = CAST(new_tweets + excluded.new_tweets AS REAL) / (total_polls + 1)",
+            (user, found_tweets, new_tweets, float(new_tweets))
+        )
+        return self.get_user_stats(user)
+
+    def get_user_stats(self, user):
+        row = self.conn.execute(
+            "SELECT total_polls, total_tweets, new_tweets, hit_rate FROM user_stats WHERE user = ?", (user,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("total_polls", "total_tweets", "new_tweets", "hit_rate"), row))
+
+    def all_user_stats(self):
+        rows = self.conn.execute("SELECT user, total_polls, total_tweets, new_tweets, hit_rate FROM user_stats")
+        return {
+            user: dict(zip(("total_polls", "total_tweets", "new_tweets", "hit_rate"), values))
+            for user, *values in rows
+        }
+
+    # Scheduler history
+    def load_scheduler_stats(self):
+        rows = self.conn.execute("SELECT user, events, exposure, last_checked, updated FROM scheduler_stats")
+        return {
+            user: dict(zip(("events", "exposure", "last_checked", "updated"), values))
+            for user, *values in rows
+        }
+
+    def save_scheduler_stats(self, user, stats):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO scheduler_stats (user, events, exposure, last_checked, updated) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (user, stats["events"], stats["exposure"], stats["last_checked"], stats["updated"])
+        )
+
+    # Migration
+    def migrate_from_json(self, rate_limit_file, seen_tweets_file, poll_stats_file):
+        """Import the legacy data/*.json files once, returns False if already done"""
+        if self.get_meta("json_migrated"):
+            return False
+
+        def read(path):
+            if path and os.path.exists(path):
+                try:
+                    with open(path, 'r') as f:
+                        return json.load(f)
+                except Exception as e:
+                    logger.error(f"Error reading {path} for migration: {e}")
+            return {}
+
+        rate_limit = read(rate_limit_file)
+        seen = read(seen_tweets_file)
+        stats = read(poll_stats_file)
+
+        self.conn.execute("BEGIN")
+        try:
+            # monthly_replies is a superset of the daily list, add daily-only ids on top
+            monthly = rate_limit.get("monthly_replies", [])
+            monthly_ids = {reply["id"] for reply in monthly}
+            daily_only = [reply for reply in rate_limit.get("replies", []) if reply["id"] not in monthly_ids]
+            self.conn.executemany(
+                "INSERT INTO replies (tweet_id, timestamp) VALUES (?, ?)",
+                [(reply["id"], reply["timestamp"]) for reply in monthly + daily_only]
+            )
+            self.conn.executemany(
+                "INSERT INTO polls (timestamp) VALUES (?)",
+                [(poll["timestamp"],) for poll in rate_limit.get("polls", [])]
+            )
+            if rate_limit.get("limiters"):
+                self.set_meta("rate_limiters", json.dumps(rate_limit["limiters"]))
+
+            marks = seen.get("marks") or seen_marks_from_tweets(seen.get("tweets", {}))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO seen_marks (user, last_id, timestamp, last_replied_id) VALUES (?, ?, ?, ?)",
+                [
+                    (user, int(mark["last_id"]), mark.get("timestamp", ""),
+                     int(mark["last_replied_id"]) if mark.get("last_replied_id") else None)
+                    for user, mark in marks.items()
+                ]
+            )
+
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO user_stats (user, total_polls, total_tweets, new_tweets, hit_rate) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (user, s.get("total_polls", 0), s.get("total_tweets", 0), s.get("new_tweets", 0), s.get("hit_rate", 0))
+                    for user, s in stats.get("user_stats", {}).items()
+                ]
+            )
+            if stats.get("last_reset"):
+                self.set_meta("stats_last_reset", stats["last_reset"])
+            for user, scheduler_stats in stats.get("scheduler", {}).items():
+                self.save_scheduler_stats(user, scheduler_stats)
+
+            self.set_meta("json_migrated", datetime.now().isoformat())
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        logger.info(
+            f"Migrated JSON state into {self.path}: "
+            f"{len(monthly) + len(daily_only)} replies, {len(rate_limit.get('polls', []))} polls, "
+            f"{len(marks)} seen marks, "
+            f"{len(stats.get('user_stats', {}))} user stats"
+        )
+        return True
@@ -0,0 +1,323 @@
+import json
+import tempfile
+import threading
+import time
+import unittest
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+import requests
+import tweepy
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+import app
+from post_queue import PostQueue
+from reply_cache import ReplyCache
+from rsshub_health import AUTH, CLIENT, CONNECTION, EMPTY, OK, PARSE, RATE_LIMITED, SERVER
+from rsshub_pool import Backend, BackendPool
+
+
+def isolate_state(test):
+    """Point app's JSON state at a temp dir with empty limits, undone when `test` ends"""
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    patches = [
+        mock.patch.object(app, "STORAGE_BACKEND", "json"),
+        mock.patch.object(app, "state_loaded", False),
+        mock.patch.object(app.scheduler, "stats", {}),
+        mock.patch.dict(app.llm_usage),
+    ]
+    for document in app.state.documents.values():
+        patches += [
+            mock.patch.object(document, "path", Path(tmp.name) / document.path.name),
+            mock.patch.object(document, "_data", document.default_factory()),
+            mock.patch.object(document, "dirty", False),
+        ]
+    for limiter in app.rate_limiter.limiters.values():
+        patches.append(mock.patch.object(limiter, "timestamps", deque(maxlen=limiter.limit)))
+    for patch in patches:
+        patch.start()
+        test.addCleanup(patch.stop)
+
+    post_queue = PostQueue(app.post_queue_doc.data, app.POST_QUEUE_TTL, app.POST_QUEUE_MAX,
+                           on_change=app.post_queue_doc.mark_dirty)
+    patch = mock.patch.object(app, "post_queue", post_queue)
+    patch.start()
+    test.addCleanup(patch.stop)
+    return Path(tmp.name)
+
+
+def twitter_response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = b"{}"
+    return response
+
+
+def failed_connect():
+    return requests.ConnectionError(MaxRetryError(None, "/2/tweets", NewConnectionError(None, "Connection refused")))
+
+
+class TestReplyToTweet(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        isolate_state(self)
+        self.client = mock.Mock()
+        for patch in [mock.patch.object(app, "get_twitter_api", return_value=self.client),
+                      mock.patch.object(app, "POST_RETRY_BASE", 0)]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def replies_counted(self):
+        return app.rate_limiter["daily_replies"].used()
+
+    async def test_503_is_retried(self):
+        self.client.create_tweet.side_effect = [tweepy.TwitterServerError(twitter_response(503)),
+                                                twitter_response(201)]
+        response = await app.reply_to_tweet("10", "hi")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.create_tweet.call_count, 2)
+        self.assertEqual(self.replies_counted(), 1)
+
+    async def test_failed_connect_is_retried(self):
+        self.client.create_tweet.side_effect = [failed_connect(), requests.exceptions.ConnectTimeout(),
+                                                twitter_response(201)]
+        self.assertIsNotNone(await app.reply_to_tweet("10", "hi"))
+        self.assertEqual(self.client.create_tweet.call_count, 3)
+
+    async def test_unknown_outcomes_are_dropped(self):
+        """Errors after the request may have reached Twitter are never sent again"""
+        for error in [requests.exceptions.ReadTimeout("read timed out"),
+                      requests.ConnectionError(ProtocolError("Connection aborted.", ConnectionResetError())),
+                      tweepy.TwitterServerError(twitter_response(500))]:
+            with self.subTest(error=error):
+                self.client.create_tweet.reset_mock()
+                self.client.create_tweet.side_effect = [error, twitter_response(201)]
+                self.assertIsNone(await app.reply_to_tweet("10", "hi"))
+                self.assertEqual(self.client.create_tweet.call_count, 1)
+        self.assertEqual(self.replies_counted(), 0)
+        self.assertEqual(app.post_queue.blocked_for(), 0)
+
+    async def test_429_pauses_posting_until_reset(self):
+        reset = int(time.time()) + 600
+        self.client.create_tweet.side_effect = [
+            tweepy.TooManyRequests(twitter_response(429, {"x-rate-limit-remaining": "0", "x-rate-limit-reset": str(reset)}))
+        ]
+        self.assertIsNone(await app.reply_to_tweet("10", "hi"))
+        self.assertEqual(self.client.create_tweet.call_count, 1)
+        self.assertEqual(app.post_queue.data["blocked_until"], reset)
+
+
+class TestSendQueuedReplies(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.data_dir = isolate_state(self)
+
+    def saved(self, path):
+        return json.loads((self.data_dir / path.name).read_text())
+
+    async def test_posted_reply_is_written_to_disk_right_away(self):
+        app.post_queue.push("bob", "10", "hi")
+        with mock.patch.object(app, "reply_to_tweet", mock.AsyncMock(return_value=twitter_response(201))):
+            self.assertIsNone(await app.send_queued_replies())
+        self.assertEqual(self.saved(app.POST_QUEUE_FILE)["pending"], [])
+        self.assertEqual(self.saved(app.SEEN_TWEETS_FILE)["marks"]["bob"]["last_replied_id"], "10")
+
+    async def test_dropped_reply_leaves_the_queue_on_disk(self):
+        app.post_queue.push("bob", "10", "hi")
+        with mock.patch.object(app, "reply_to_tweet", mock.AsyncMock(return_value=None)):
+            await app.send_queued_replies()
+        self.assertEqual(self.saved(app.POST_QUEUE_FILE)["pending"], [])
+
+
+class TestGenerateReply(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        isolate_state(self)
+        self.drafts = iter(["first draft here", "second draft here", "third draft here", "fourth draft here"])
+        self.draft_reply = mock.AsyncMock(side_effect=lambda prompt: next(self.drafts))
+        for patch in [mock.patch.object(app, "draft_reply", self.draft_reply),
+                      mock.patch.object(app, "reply_cache", ReplyCache()),
+                      mock.patch.object(app, "recent_replies", deque(maxlen=50)),
+                      mock.patch.object(app, "REPLY_CANDIDATES", 1)]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def test_cache_miss_generates_an_alternate_for_the_next_duplicate(self):
+        first = await app.generate_reply("bob posted a picture", "bob")
+        self.assertEqual(self.draft_reply.call_count, 2)
+
+        # Same context from another account: the alternate, no LLM call, never the posted text
+        second = await app.generate_reply("carol posted a picture", "carol")
+        self.assertEqual(self.draft_reply.call_count, 2)
+        self.assertNotEqual(first, second)
+
+        # Both drafts used up, the next duplicate pays for fresh ones
+        third = await app.generate_reply("dave posted a picture", "dave")
+        self.assertEqual(self.draft_reply.call_count, 4)
+        self.assertNotIn(third, (first, second))
+
+
+def tweet(tweet_id, title="text", author="bob"):
+    return {"id": str(tweet_id), "author": author, "title": title,
+            "link": f"https://x.com/{author}/status/{tweet_id}", "published": ""}
+
+
+class TestProcessFeedEntries(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        isolate_state(self)
+
+    async def test_first_poll_only_counts_the_latest_tweet(self):
+        targets = await app.process_feed_entries("bob", [tweet(5), tweet(9), tweet(7)])
+        self.assertEqual([t["id"] for _, t in targets], ["9"])
+        self.assertEqual(app.last_seen_id("bob"), 9)
+        self.assertEqual(app.load_poll_stats()["user_stats"]["bob"]["new_tweets"], 1)
+
+    async def test_page_is_diffed_against_the_seen_mark(self):
+        app.mark_tweet_as_seen("bob", "7")
+        with mock.patch.object(app, "MAX_REPLIES_PER_POLL", 2):
+            targets = await app.process_feed_entries("bob", [tweet(3), tweet(9), tweet(7), tweet(8)])
+        self.assertEqual([t["id"] for _, t in targets], ["9", "8"])
+        self.assertEqual(app.last_seen_id("bob"), 9)
+        self.assertEqual(app.load_poll_stats()["user_stats"]["bob"]["new_tweets"], 2)
+
+        # Nothing newer than the mark on the next poll
+        self.assertEqual(await app.process_feed_entries("bob", [tweet(9), tweet(8)]), [])
+        self.assertEqual(app.last_seen_id("bob"), 9)
+
+    async def test_empty_feed_still_counts_as_a_poll(self):
+        self.assertEqual(await app.process_feed_entries("bob", []), [])
+        self.assertIsNone(app.last_seen_id("bob"))
+        self.assertEqual(app.load_poll_stats()["user_stats"]["bob"]["total_polls"], 1)
+
+
+class TestSelectReplyTargets(unittest.TestCase):
+    def test_text_beats_media_then_newer_beats_older(self):
+        tweets = [tweet(30, title=" "), tweet(10), tweet(20), tweet(40, title="")]
+        self.assertEqual([t["id"] for t in app.select_reply_targets(tweets, 3)], ["20", "10", "40"])
+
+
+def rss_items(*tweets):
+    """RSS with one item per (author, tweet ID), newest first like RSSHub"""
+    items = "".join(f"<item><title>tweet {tweet_id}</title><link>https://x.com/{author}/status/{tweet_id}</link>"
+                    f"<pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate></item>" for author, tweet_id in tweets)
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>{items}</channel></rss>'.encode()
+
+
+def rss(*tweet_ids):
+    return rss_items(*(("bob", tweet_id) for tweet_id in tweet_ids))
+
+
+class FeedHandler(BaseHTTPRequestHandler):
+    """Serves `routes` ({path: (status, body, headers)}), answering 304 when the ETag matches"""
+    routes = {}
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append((self.path, dict(self.headers)))
+        status, body, headers = self.routes[self.path]
+        if "ETag" in headers and self.headers.get("If-None-Match") == headers["ETag"]:
+            status, body = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FeedServerMixin:
+    """Runs a FeedHandler server for the test class, reset before each test"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FeedHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        FeedHandler.routes = {}
+        FeedHandler.requests = []
+
+
+class TestFetchFeedUrl(FeedServerMixin, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        patch = mock.patch.dict(app.feed_cache, clear=True)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def fetch(self, path, body, status=200, headers=None, stop_at=None):
+        FeedHandler.routes[path] = (status, body, headers or {})
+        return app.fetch_feed_url("bob", self.base_url + path, stop_at)
+
+    def test_unchanged_feed_is_revalidated_with_its_etag(self):
+        kind, entries = self.fetch("/bob", rss(3, 2), headers={"ETag": '"v1"'})
+        self.assertEqual((kind, [entry["id"] for entry in entries]), (OK, ["3", "2"]))
+
+        kind, cached = app.fetch_feed_url("bob", self.base_url + "/bob")
+        self.assertEqual((kind, cached), (OK, entries))
+        self.assertEqual(FeedHandler.requests[1][1].get("If-None-Match"), '"v1"')
+
+    def test_error_statuses_are_classified(self):
+        for status, kind in [(429, RATE_LIMITED), (401, AUTH), (403, AUTH), (503, SERVER), (404, CLIENT)]:
+            with self.subTest(status=status):
+                self.assertEqual(self.fetch(f"/{status}", b"error", status=status), (kind, []))
+
+    def test_quiet_feeds_and_error_pages(self):
+        self.assertEqual(self.fetch("/quiet", rss()), (EMPTY, []))
+        self.assertEqual(self.fetch("/html", b"<html><body>Error</body></html>"), (PARSE, []))
+        self.assertEqual(app.fetch_feed_url("bob", "http://127.0.0.1:9/bob"), (CONNECTION, []))
+
+    def test_other_feed_formats_fall_back_to_feedparser(self):
+        atom = b"""<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom"><title>t</title>
+            <entry><title>hi</title><link href="https://x.com/bob/status/7"/><id>7</id></entry></feed>"""
+        kind, entries = self.fetch("/atom", atom)
+        self.assertEqual((kind, [entry["id"] for entry in entries]), (OK, ["7"]))
+
+    def test_stops_at_the_last_seen_tweet(self):
+        kind, entries = self.fetch("/bob", rss(9, 8, 7, 6), stop_at=7)
+        self.assertEqual([entry["id"] for entry in entries], ["9", "8"])
+
+
+class TestFetchFeedBatch(FeedServerMixin, unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        super().setUp()
+        isolate_state(self)
+
+    def use_batch_route(self, route):
+        pool = BackendPool([Backend(self.base_url + route, "rsshub")])
+        for patch in [mock.patch.object(app, "batch_pool", pool),
+                      mock.patch.object(app, "LIST_ROUTE", "{users}" not in route),
+                      mock.patch.object(app, "USERS", ["alice", "bob", "carol"])]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    async def test_list_route_processes_every_monitored_author(self):
+        self.use_batch_route("/list")
+        FeedHandler.routes["/list"] = (200, rss_items(("bob", 5), ("stranger", 4), ("Alice", 3)), {})
+        checked = await app.fetch_feed_batch(["carol"])
+
+        self.assertEqual([(user, [entry["id"] for entry in entries]) for user, entries, _ in checked],
+                         [("alice", ["3"]), ("bob", ["5"]), ("carol", [])])
+        self.assertEqual(app.rate_limiter["polls"].used(), 1)
+
+    async def test_multi_user_route_only_returns_the_requested_users(self):
+        self.use_batch_route("/multi/{users}")
+        FeedHandler.routes["/multi/alice,bob"] = (200, rss_items(("bob", 5), ("carol", 4)), {})
+        checked = await app.fetch_feed_batch(["alice", "bob"])
+
+        self.assertEqual([(user, [entry["id"] for entry in entries]) for user, entries, _ in checked],
+                         [("alice", []), ("bob", ["5"])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import asyncio
+import unittest
+from batch_generation import BatchClient, BatchReplyStage
+
+
+def message(text):
+    return {"content": [{"type": "text", "text": text}], "usage": {"input_tokens": 1, "output_tokens": 1}}
+
+
+class FakeBatchClient(BatchClient):
+    """In-memory Message Batches backend that ends batches after `polls_until_ended` status checks"""
+
+    def __init__(self, polls_until_ended=1, failing_ids=()):
+        self.polls_until_ended = polls_until_ended
+        self.failing_ids = set(failing_ids)
+        self.batches = {}
+        self.cancelled = []
+
+    async def create(self, requests):
+        batch_id = f"batch-{len(self.batches) + 1}"
+        self.batches[batch_id] = {"requests": requests, "polls": 0}
+        return batch_id
+
+    async def status(self, batch_id):
+        batch = self.batches[batch_id]
+        batch["polls"] += 1
+        return "ended" if batch["polls"] >= self.polls_until_ended else "in_progress"
+
+    async def results(self, batch_id):
+        return {
+            request["custom_id"]: None if request["custom_id"] in self.failing_ids
+            else message("batched " + request["params"]["prompt"])
+            for request in self.batches[batch_id]["requests"]
+        }
+
+    async def cancel(self, batch_id):
+        self.cancelled.append(batch_id)
+
+
+class TestBatchReplyStage(unittest.IsolatedAsyncioTestCase):
+    async def fallback(self, params):
+        self.fallback_calls.append(params)
+        return message("direct " + params["prompt"])
+
+    def make_stage(self, batch_client, **kwargs):
+        self.fallback_calls = []
+        options = {"max_batch_size": 10, "collect_window": 0.05, "poll_interval": 0.01, "latency_cap": 1}
+        options.update(kwargs)
+        stage = BatchReplyStage(batch_client, self.fallback, **options)
+        self.runner = asyncio.create_task(stage.run())
+        return stage
+
+    async def asyncTearDown(self):
+        self.runner.cancel()
+
+    async def test_requests_are_batched_together(self):
+        """Requests queued within the collect window share one batch"""
+        batch_client = FakeBatchClient()
+        stage = self.make_stage(batch_client)
+        results = await asyncio.gather(*(stage.generate({"prompt": str(i)}) for i in range(3)))
+
+        self.assertEqual([r["content"][0]["text"] for r in results], ["batched 0", "batched 1", "batched 2"])
+        self.assertEqual(len(batch_client.batches), 1)
+        self.assertEqual(self.fallback_calls, [])
+
+    async def test_latency_cap_falls_back_to_direct_calls(self):
+        """A batch that doesn't end in time is cancelled and answered directly"""
+        batch_client = FakeBatchClient(polls_until_ended=1000)
+        stage = self.make_stage(batch_client, latency_cap=0.05)
+        result = await stage.generate({"prompt": "slow"})
+
+        self.assertEqual(result["content"][0]["text"], "direct slow")
+        self.assertEqual(batch_client.cancelled, ["batch-1"])
+
+    async def test_failed_requests_fall_back(self):
+        """Requests that errored inside the batch are retried directly"""
+        batch_client = FakeBatchClient(failing_ids={"reply-2"})
+        stage = self.make_stage(batch_client)
+        results = await asyncio.gather(stage.generate({"prompt": "a"}), stage.generate({"prompt": "b"}))
+
+        self.assertEqual([r["content"][0]["text"] for r in results], ["batched a", "direct b"])
+        self.assertEqual(self.fallback_calls, [{"prompt": "b"}])
+
+
+class TestBatchClient(unittest.TestCase):
+    def test_incomplete_client_cannot_be_created(self):
+        """A client missing part of the interface fails when created, not on first use"""
+        class NoCancel(BatchClient):
+            async def create(self, requests):
+                return "batch-1"
+
+            async def status(self, batch_id):
+                return "ended"
+
+            async def results(self, batch_id):
+                return {}
+
+        with self.assertRaises(TypeError):
+            NoCancel()
+
+
+if __name__ == '__main__':
+    unittest.main()
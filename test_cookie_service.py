@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import unittest
+from cookie_service import CookieRefreshService
+
+
+class TestCookieRefreshService(unittest.IsolatedAsyncioTestCase):
+    def make_service(self, results, **kwargs):
+        calls = []
+
+        def refresh():
+            calls.append(threading.current_thread().name)
+            return results.pop(0)
+
+        service = CookieRefreshService(refresh, debounce=0.01, **kwargs)
+        service.bind()
+        return service, calls
+
+    async def settle(self, service):
+        await asyncio.sleep(0)
+        if service.task is not None:
+            await service.task
+
+    async def test_concurrent_failures_coalesce_into_one_refresh(self):
+        service, calls = self.make_service([True], cooldown=0)
+        threads = [threading.Thread(target=service.request, args=(f"user{i}",)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        await self.settle(service)
+
+        self.assertEqual(len(calls), 1)
+        self.assertNotEqual(calls[0], threading.current_thread().name)  # Ran off the event loop
+        self.assertEqual(service.stats["coalesced"], 9)
+
+    async def test_cooldown_suppresses_refreshes(self):
+        service, calls = self.make_service([True, True], cooldown=60)
+        service.request("first")
+        await self.settle(service)
+        service.request("second")
+        await self.settle(service)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(service.stats["suppressed"], 1)
+
+    async def test_circuit_opens_after_repeated_failures_then_half_opens(self):
+        service, calls = self.make_service([False, False, True], cooldown=0, max_failures=2, open_duration=0.05)
+        for _ in range(2):
+            service.request("down")
+            await self.settle(service)
+        self.assertEqual(service.state, "open")
+
+        service.request("still down")
+        await self.settle(service)
+        self.assertEqual(len(calls), 2)
+
+        await asyncio.sleep(0.06)
+        service.request("trial")
+        await asyncio.sleep(0)
+        self.assertEqual(service.state, "half_open")
+        await self.settle(service)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(service.state, "closed")
+        self.assertEqual(service.failures, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
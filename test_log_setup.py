@@ -0,0 +1,84 @@
+import json
+import logging
+import queue
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from log_setup import JsonFormatter, NonBlockingQueueHandler, configure_logging, parse_levels
+
+
+class TestLogSetup(unittest.TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.saved = self.root.handlers[:], self.root.level
+        self.root.handlers = []
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.root.handlers, level = self.saved
+        self.root.setLevel(level)
+        logging.getLogger("quiet_module").setLevel(logging.NOTSET)
+        self.tmp.cleanup()
+
+    def test_writes_json_lines_from_background_thread_with_rotation(self):
+        log_file = Path(self.tmp.name) / "bot.log"
+        listener = configure_logging(log_file, "INFO", "json", max_bytes=400, backups=5,
+                                     levels=parse_levels("quiet_module=WARNING"), console=False)
+        log = logging.getLogger("bot")
+        log.info("Found %d tweets from %s", 3, "sama", extra={"user": "sama"})
+        logging.getLogger("quiet_module").info("filtered out")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            log.exception("Failed")
+        for i in range(5):
+            log.info("filler line %d", i)
+        listener.stop()
+        self.root.handlers = []
+
+        # The file rotated, and every line in every file is a complete JSON record
+        rotated = list(Path(self.tmp.name).glob("bot.log.*"))
+        self.assertTrue(rotated)
+        entries = [json.loads(line) for path in rotated + [log_file] for line in path.read_text().splitlines()]
+        found = next(entry for entry in entries if entry["message"].startswith("Found"))
+        self.assertEqual(found["message"], "Found 3 tweets from sama")
+        self.assertEqual((found["level"], found["logger"], found["user"]), ("INFO", "bot", "sama"))
+        failed = next(entry for entry in entries if entry["message"] == "Failed")
+        self.assertIn("ValueError: boom", failed["exception"])
+        self.assertNotIn("filtered out", [entry["message"] for entry in entries])
+        self.assertEqual(len(entries), 7)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        log = logging.getLogger("burst")
+        log.addHandler(handler)
+        log.propagate = False
+        try:
+            for i in range(3):
+                log.warning("burst %d", i)
+        finally:
+            log.removeHandler(handler)
+            log.propagate = True
+        self.assertEqual(handler.dropped, 2)
+        self.assertEqual(handler.queue.get_nowait().msg, "burst 0")
+
+    def test_json_formatter_keeps_traceback(self):
+        handler = NonBlockingQueueHandler(queue.Queue())
+        try:
+            raise KeyError("missing")
+        except KeyError:
+            record = logging.getLogger("bot").makeRecord("bot", logging.ERROR, __file__, 1, "Failed %s", ("x",),
+                                                         exc_info=sys.exc_info())
+        entry = json.loads(JsonFormatter().format(handler.prepare(record)))
+        self.assertEqual(entry["message"], "Failed x")
+        self.assertIn("KeyError: 'missing'", entry["exception"])
+
+    def test_parse_levels(self):
+        self.assertEqual(parse_levels(" app=debug, cookie_service=WARNING,bad "),
+                         {"app": "DEBUG", "cookie_service": "WARNING"})
+        self.assertEqual(parse_levels(""), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
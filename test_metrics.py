@@ -0,0 +1,64 @@
+import asyncio
+import unittest
+from metrics import Registry, serve_metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter_and_histogram_exposition(self):
+        registry = Registry(prefix="bot_")
+        errors = registry.counter("post_errors_total", "Failed posts", ("reason",))
+        latency = registry.histogram("fetch_seconds", "Fetch latency", ("outcome",), buckets=(0.1, 1))
+        errors.inc("rate_limited")
+        errors.inc("rate_limited", amount=2)
+        latency.observe(0.05, "ok")
+        latency.observe(0.5, "ok")
+        latency.observe(5, "ok")
+
+        lines = registry.render().splitlines()
+        self.assertIn("# TYPE bot_post_errors_total counter", lines)
+        self.assertIn('bot_post_errors_total{reason="rate_limited"} 3', lines)
+        self.assertIn("# TYPE bot_fetch_seconds histogram", lines)
+        # Buckets are cumulative, the last one counts everything
+        self.assertIn('bot_fetch_seconds_bucket{outcome="ok",le="0.1"} 1', lines)
+        self.assertIn('bot_fetch_seconds_bucket{outcome="ok",le="1"} 2', lines)
+        self.assertIn('bot_fetch_seconds_bucket{outcome="ok",le="+Inf"} 3', lines)
+        self.assertIn('bot_fetch_seconds_sum{outcome="ok"} 5.55', lines)
+        self.assertIn('bot_fetch_seconds_count{outcome="ok"} 3', lines)
+
+    def test_callback_metrics_read_state_when_rendered(self):
+        registry = Registry()
+        state = {"daily": 16}
+        registry.callback("headroom", "Permits left", lambda: {(name,): left for name, left in state.items()}, ("limit",))
+        registry.callback("queued", "Queue length", lambda: len(state))
+        registry.callback("broken", "Fails to collect", lambda: 1 / 0)
+
+        state["daily"] = 3
+        rendered = registry.render()
+        self.assertIn('headroom{limit="daily"} 3', rendered)
+        self.assertIn("queued 1", rendered)
+        self.assertNotIn("broken", rendered)  # One failing callback doesn't break the scrape
+
+    def test_serves_metrics_over_http(self):
+        registry = Registry()
+        registry.gauge("up", "Bot is running").set(1)
+
+        async def scrape(path):
+            server = await serve_metrics(registry, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            response = await reader.read()
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return response.decode()
+
+        response = asyncio.run(scrape("/metrics"))
+        self.assertTrue(response.startswith("HTTP/1.1 200 OK"))
+        self.assertIn("\r\n\r\n# HELP up Bot is running", response)
+        self.assertIn("up 1\n", response)
+        self.assertTrue(asyncio.run(scrape("/nope")).startswith("HTTP/1.1 404"))
+
+
+if __name__ == "__main__":
+    unittest.main()
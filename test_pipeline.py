@@ -0,0 +1,97 @@
+import asyncio
+import time
+import unittest
+from pipeline import Pipeline, Stage
+
+
+class TestPipeline(unittest.IsolatedAsyncioTestCase):
+    async def test_items_flow_through_every_stage(self):
+        posted = []
+
+        async def double(n):
+            return [(n, n * 2)]
+
+        async def post(n, doubled):
+            posted.append(doubled)
+
+        pipeline = Pipeline([Stage("double", double, workers=2), Stage("post", post)])
+        pipeline.start()
+        for n in range(5):
+            await pipeline.submit(n)
+        await pipeline.join()
+        await pipeline.stop()
+
+        self.assertEqual(sorted(posted), [0, 2, 4, 6, 8])
+        self.assertEqual(pipeline.metrics()["post"]["processed"], 5)
+
+    async def test_full_queue_pushes_back_on_the_previous_stage(self):
+        """A stalled stage fills its queue and the upstream stage stops taking work"""
+        release = asyncio.Event()
+
+        async def produce(n):
+            return [(n,)]
+
+        async def slow(n):
+            await release.wait()
+
+        pipeline = Pipeline([Stage("produce", produce, queue_size=1), Stage("slow", slow, queue_size=1)])
+        pipeline.start()
+        for n in range(3):
+            await asyncio.wait_for(pipeline.submit(n), 1)
+        await asyncio.sleep(0.01)
+
+        # One item in the slow handler, one queued for it, one held by the blocked producer
+        self.assertEqual(pipeline.metrics()["slow"]["queued"], 1)
+        self.assertEqual(pipeline.metrics()["produce"]["processed"], 3)
+        await asyncio.wait_for(pipeline.submit(3), 1)
+        self.assertEqual(pipeline.metrics()["produce"]["queued"], 1)
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(pipeline.submit(4), 0.05)
+
+        release.set()
+        await pipeline.join()
+        await pipeline.stop()
+        self.assertEqual(pipeline.metrics()["slow"]["processed"], 4)  # The timed out submit never got in
+
+    async def test_admission_control_and_failures(self):
+        rejected = []
+
+        async def handle(n):
+            if n == 3:
+                raise ValueError("boom")
+
+        async def reject(n):
+            rejected.append(n)
+
+        stage = Stage("post", handle, admit=lambda n: n % 2 == 1, on_reject=reject)
+        pipeline = Pipeline([stage])
+        pipeline.start()
+        for n in range(4):
+            await pipeline.submit(n)
+        await pipeline.join()
+        await pipeline.stop()
+
+        self.assertEqual(rejected, [0, 2])
+        self.assertEqual(stage.stats, {"processed": 1, "failed": 1, "rejected": 2})
+
+    async def test_delay_spaces_item_starts_across_workers(self):
+        """Every item gets its own slot even with idle workers and a short queue"""
+        started = []
+
+        async def fetch(n):
+            started.append(time.monotonic())
+
+        pipeline = Pipeline([Stage("fetch", fetch, workers=3, delay=(0.05, 0.05))])
+        pipeline.start()
+        for n in range(3):
+            await pipeline.submit(n)
+        await pipeline.join()
+        await pipeline.stop()
+
+        gaps = [later - earlier for earlier, later in zip(started, started[1:])]
+        self.assertEqual(len(gaps), 2)
+        self.assertTrue(all(gap >= 0.04 for gap in gaps), gaps)
+
+
+if __name__ == '__main__':
+    unittest.main()
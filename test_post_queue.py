@@ -0,0 +1,42 @@
+import unittest
+from post_queue import PostQueue
+
+
+class TestPostQueue(unittest.TestCase):
+    def test_replies_are_sent_in_order_and_stale_ones_dropped(self):
+        queue = PostQueue(ttl=100)
+        queue.push("bob", 1, "first", now=0)
+        queue.push("carl", 2, "second", now=50)
+        self.assertEqual(queue.time_until_expiry(now=60), 40)
+
+        expired = queue.drop_expired(now=120)
+        self.assertEqual([entry["reply"] for entry in expired], ["first"])
+        self.assertEqual(queue.pop()["tweet_id"], "2")
+        self.assertIsNone(queue.peek())
+
+    def test_oldest_reply_makes_room_when_full(self):
+        queue = PostQueue(max_size=2)
+        queue.push("a", 1, "one", now=0)
+        queue.push("b", 2, "two", now=0)
+        self.assertEqual(queue.push("c", 3, "three", now=0)["reply"], "one")
+        self.assertEqual(len(queue), 2)
+
+    def test_reset_header_blocks_sends_and_state_persists(self):
+        changes = []
+        data = {}
+        queue = PostQueue(data, on_change=lambda: changes.append(1))
+        queue.block_until(1000)
+        queue.block_until(500)  # An earlier reset never shortens the wait
+        queue.push("bob", 1, "hi", now=0)
+        self.assertEqual(queue.blocked_for(now=900), 100)
+        self.assertEqual(queue.blocked_for(now=1001), 0.0)
+
+        # A restart picks the queue back up from the same document
+        restored = PostQueue(data)
+        self.assertEqual(len(restored), 1)
+        self.assertEqual(restored.blocked_for(now=900), 100)
+        self.assertEqual(len(changes), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
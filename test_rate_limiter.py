@@ -0,0 +1,69 @@
+import unittest
+import random
+from rate_limiter import RateLimiter, SlidingWindowLimiter, backoff_delay
+
+
+class TestSlidingWindowLimiter(unittest.TestCase):
+    def test_limit_applies_to_any_rolling_window(self):
+        """A burst right after the window start can't exceed the limit"""
+        limiter = SlidingWindowLimiter(2, 100)
+        self.assertTrue(limiter.try_acquire(now=0))
+        self.assertTrue(limiter.try_acquire(now=90))
+        self.assertFalse(limiter.try_acquire(now=99))
+
+        # The first permit expires at t=100, the second only at t=190
+        self.assertTrue(limiter.try_acquire(now=100.5))
+        self.assertFalse(limiter.try_acquire(now=150))
+
+    def test_time_until_available_is_exact(self):
+        """The wait reported is until the oldest permit leaves the window"""
+        limiter = SlidingWindowLimiter(2, 100)
+        self.assertEqual(limiter.time_until_available(now=0), 0.0)
+        limiter.consume(now=10)
+        limiter.consume(now=30)
+        self.assertEqual(limiter.time_until_available(now=50), 60)
+        self.assertTrue(limiter.can_acquire(now=110))
+
+        # Both permits are only free again once the second one leaves the window too
+        self.assertEqual(limiter.time_until_available(now=50, count=2), 80)
+        self.assertEqual(limiter.time_until_available(now=50, count=3), float("inf"))
+
+    def test_state_is_bounded_by_limit(self):
+        """Only the newest `limit` timestamps are kept"""
+        limiter = SlidingWindowLimiter(3, 1000)
+        for ts in range(10):
+            limiter.consume(now=ts)
+        self.assertEqual(limiter.state(), [7, 8, 9])
+        self.assertEqual(limiter.used(now=9), 3)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_group_checks_and_round_trips_state(self):
+        """A group is available only when every named limit is, and its state reloads"""
+        limiter = RateLimiter({
+            "daily": SlidingWindowLimiter(1, 10),
+            "monthly": SlidingWindowLimiter(5, 100),
+        })
+        limiter.consume("daily", "monthly", now=0)
+        self.assertFalse(limiter.can_acquire("daily", "monthly", now=5))
+        self.assertEqual(limiter.time_until_available("daily", "monthly", now=5), 5)
+
+        restored = RateLimiter({
+            "daily": SlidingWindowLimiter(1, 10),
+            "monthly": SlidingWindowLimiter(5, 100),
+        })
+        restored.load(limiter.state())
+        self.assertEqual(restored.state(), {"daily": [0], "monthly": [0]})
+
+
+class TestBackoffDelay(unittest.TestCase):
+    def test_delay_grows_exponentially_up_to_the_cap(self):
+        rng = random.Random(1)
+        for attempt, ceiling in [(0, 2), (1, 4), (3, 16), (10, 300)]:
+            delays = [backoff_delay(attempt, rng=rng) for _ in range(50)]
+            self.assertTrue(all(0 <= delay <= ceiling for delay in delays))
+            self.assertGreater(max(delays), ceiling / 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from reply_cache import ReplyCache, context_key
+
+
+class TestContextKey(unittest.TestCase):
+    def test_media_posts_from_different_users_share_a_key(self):
+        self.assertEqual(context_key("elonmusk posted a picture", "elonmusk"),
+                         context_key("sama posted a picture", "sama"))
+
+    def test_retweets_urls_and_punctuation_are_ignored(self):
+        self.assertEqual(
+            context_key('The original tweet from bob says:\n\n"RT @alice: Big launch today! https://t.co/abc"', "bob"),
+            context_key('The original tweet from carl says:\n\n"big launch today"', "carl")
+        )
+        self.assertNotEqual(context_key("big launch today"), context_key("small launch today"))
+
+
+class TestReplyCache(unittest.TestCase):
+    def test_rotates_through_drafts_until_used_up(self):
+        """Each draft is served `draft_uses` times, best first, then it's a miss"""
+        cache = ReplyCache(draft_uses=1)
+        cache.put("bob posted a picture", ["best", "second"], user="bob", now=0)
+        self.assertEqual(cache.get("carl posted a picture", user="carl", now=1), "second")
+        self.assertIsNone(cache.get("carl posted a picture", user="carl", now=2))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_posted_drafts_are_never_served_again(self):
+        """By default a hit only returns alternates that weren't posted"""
+        cache = ReplyCache()
+        cache.put("bob posted a picture", ["posted"], user="bob", now=0)
+        self.assertEqual(len(cache), 0)  # A lone draft was just posted, nothing to reuse
+
+        cache.put("bob posted a picture", ["posted", "alternate"], user="bob", now=0)
+        self.assertEqual(cache.get("carl posted a picture", user="carl", now=1), "alternate")
+        self.assertIsNone(cache.get("dave posted a picture", user="dave", now=2))
+
+    def test_entries_expire(self):
+        cache = ReplyCache(ttl=10, draft_uses=5)
+        cache.put("hello", ["draft"], now=0)
+        self.assertEqual(cache.get("hello", now=5), "draft")
+        self.assertIsNone(cache.get("hello", now=11))
+        self.assertEqual(len(cache), 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ReplyCache(max_entries=2, draft_uses=5)
+        cache.put("one", ["1"], now=0)
+        cache.put("two", ["2"], now=0)
+        cache.get("one", now=1)
+        cache.put("three", ["3"], now=2)
+        self.assertEqual(cache.get("one", now=3), "1")
+        self.assertIsNone(cache.get("two", now=3))
+
+    def test_changes_are_reported_for_persistence(self):
+        changes = []
+        entries = {}
+        cache = ReplyCache(entries=entries, on_change=lambda: changes.append(1))
+        cache.put("hello", ["draft", "alternate"], now=0)
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(len(changes), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+from pathlib import Path
+from rss_parser import parse_feed_fallback, parse_rsshub_feed
+
+FIXTURE = Path(__file__).resolve().parent / "benchmarks" / "fixtures" / "rsshub_user.xml"
+
+
+def rss(*items):
+    body = "".join(f"<item><title>{title}</title><link>{link}</link><pubDate>Mon, 01 Jan 2024 00:00:00 GMT</pubDate></item>"
+                   for title, link in items)
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>{body}</channel></rss>'.encode()
+
+
+class TestParseRsshubFeed(unittest.TestCase):
+    def test_matches_feedparser_on_recorded_feed(self):
+        content = FIXTURE.read_bytes()
+        entries = parse_rsshub_feed(content)
+        self.assertEqual(len(entries), 20)
+        self.assertEqual(entries, parse_feed_fallback(content))
+        self.assertEqual(set(entries[0]), {"id", "author", "title", "link", "published"})
+
+    def test_stops_at_last_seen_id(self):
+        content = rss(("pinned", "https://x.com/bob/status/5"),
+                      ("newest", "https://x.com/bob/status/30"),
+                      ("new", "https://twitter.com/bob/status/20"),
+                      ("seen", "https://x.com/bob/status/10"),
+                      ("older", "https://x.com/bob/status/9"))
+        entries = parse_rsshub_feed(content, "bob", stop_at=10)
+        # A pinned old tweet first doesn't end the parse early
+        self.assertEqual([entry["id"] for entry in entries], ["5", "30", "20"])
+        self.assertEqual(entries[2]["author"], "bob")
+
+    def test_other_authors_dont_stop_the_parse(self):
+        content = rss(("newest", "https://x.com/bob/status/300"),
+                      ("retweet", "https://x.com/other/status/50"),
+                      ("new", "https://x.com/Bob/status/250"),
+                      ("seen", "https://x.com/bob/status/200"))
+        entries = parse_rsshub_feed(content, "bob", stop_at=200)
+        # The retweeted older tweet is kept and the parse goes on to bob's newer tweets
+        self.assertEqual([entry["id"] for entry in entries], ["300", "50", "250"])
+
+    def test_items_without_status_links_are_skipped(self):
+        entries = parse_rsshub_feed(rss(("a", "https://example.com/post"), ("b", "https://x.com/bob/status/1")))
+        self.assertEqual([entry["id"] for entry in entries], ["1"])
+
+    def test_rejects_what_isnt_rss(self):
+        for content in [b"<html><body>Error</body></html>", b"<rss><channel><item>", b"", b"Internal error"]:
+            with self.assertRaises(ValueError):
+                parse_rsshub_feed(content)
+
+
+class TestParseFeedFallback(unittest.TestCase):
+    def test_atom_and_non_feeds(self):
+        atom = b"""<?xml version="1.0"?><feed xmlns="http://www.w3.org/2005/Atom"><title>t</title>
+            <entry><title>hi</title><link href="https://x.com/bob/status/7"/><id>7</id></entry></feed>"""
+        self.assertEqual([entry["id"] for entry in parse_feed_fallback(atom)], ["7"])
+        self.assertIsNone(parse_feed_fallback(b"<html><body>Error</body></html>"))
+        self.assertEqual(parse_feed_fallback(rss()), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from rsshub_health import (
+    AUTH, CLIENT, CONNECTION, EMPTY, OK, RATE_LIMITED, SERVER,
+    BackendHealth, classify_status
+)
+
+
+class TestClassifyStatus(unittest.TestCase):
+    def test_statuses(self):
+        self.assertEqual(classify_status(304), OK)
+        self.assertEqual(classify_status(403), AUTH)
+        self.assertEqual(classify_status(429), RATE_LIMITED)
+        self.assertEqual(classify_status(503), SERVER)
+        self.assertEqual(classify_status(404), CLIENT)
+
+
+class TestBackendHealth(unittest.TestCase):
+    def test_empty_feeds_are_not_an_outage(self):
+        health = BackendHealth(min_requests=2, max_consecutive=2)
+        for ts in range(10):
+            self.assertFalse(health.record(EMPTY, now=ts))
+        self.assertEqual(health.state, "closed")
+        self.assertEqual(health.error_rate(now=10), 0.0)
+
+    def test_error_rate_opens_the_circuit(self):
+        health = BackendHealth(min_requests=4, error_threshold=0.5, max_consecutive=10)
+        health.record(OK, now=0)
+        health.record(SERVER, now=1)
+        health.record(OK, now=2)
+        self.assertTrue(health.record(CONNECTION, now=3))  # 2 of 4 failed
+        self.assertEqual(health.state, "open")
+        self.assertFalse(health.allow_request(now=4))
+        self.assertEqual(health.time_until_retry(now=4), 299)
+
+    def test_old_errors_leave_the_window(self):
+        health = BackendHealth(window=100, min_requests=2, error_threshold=0.5, max_consecutive=10)
+        health.record(SERVER, now=0)
+        health.record(OK, now=150)
+        self.assertFalse(health.record(OK, now=151))
+        self.assertEqual(health.error_rate(now=151), 0.0)
+
+    def test_half_open_allows_one_trial(self):
+        health = BackendHealth(max_consecutive=1, open_duration=10, max_open_duration=15)
+        health.record(AUTH, now=0)
+        self.assertFalse(health.allow_request(now=5))
+        self.assertTrue(health.available(now=10))
+        self.assertTrue(health.allow_request(now=10))
+        self.assertFalse(health.available(now=10))
+        self.assertFalse(health.allow_request(now=10))  # Trial already in flight
+        self.assertTrue(health.record(SERVER, now=11))
+
+        # Failed trial doubles the wait, capped
+        self.assertFalse(health.allow_request(now=25))
+        self.assertTrue(health.allow_request(now=26))
+        self.assertFalse(health.record(OK, now=26))
+        self.assertEqual(health.state, "closed")
+        self.assertTrue(health.allow_request(now=27))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from rsshub_health import CONNECTION, OK, BackendHealth
+from rsshub_pool import Backend, BackendPool, parse_backends
+
+
+class TestBackendPool(unittest.TestCase):
+    def make_pool(self, count=2):
+        return BackendPool([Backend(f"http://rsshub{i}/", health=BackendHealth(max_consecutive=2))
+                            for i in range(count)])
+
+    def test_routes_to_least_loaded_backend(self):
+        pool = self.make_pool()
+        fast, slow = pool.backends
+        fast.latency, slow.latency = 0.1, 0.5
+
+        # The fast backend takes requests until its queue makes it the slower choice
+        picks = [pool.acquire().url for _ in range(6)]
+        self.assertEqual(picks.count(fast.url), 5)
+        self.assertEqual(slow.outstanding, 1)
+
+        pool.release(fast, OK, 0.3)
+        self.assertEqual(fast.outstanding, 4)
+        self.assertAlmostEqual(fast.latency, 0.16)
+
+    def test_fails_over_and_skips_open_circuits(self):
+        pool = self.make_pool()
+        first = pool.acquire(now=0)
+        second = pool.acquire(exclude=[first], now=0)
+        self.assertIsNot(first, second)
+        self.assertIsNone(pool.acquire(exclude=[first, second], now=0))
+
+        # Two connection errors in a row open the first backend's circuit
+        pool.release(first, CONNECTION, 0.01, now=0)
+        self.assertTrue(pool.release(first, CONNECTION, 0.01, now=1))
+        self.assertIsNone(first.latency)  # Fast failures don't count as good latency
+        for _ in range(3):
+            self.assertIs(pool.acquire(now=2), second)
+        self.assertEqual(pool.time_until_retry(now=2), 0.0)
+
+    def test_time_until_retry_when_all_down(self):
+        pool = self.make_pool(1)
+        backend = pool.acquire(now=0)
+        pool.release(backend, CONNECTION, 0.01, now=0)
+        pool.acquire(now=0)
+        pool.release(backend, CONNECTION, 0.01, now=0)
+        self.assertIsNone(pool.acquire(now=10))
+        self.assertEqual(pool.time_until_retry(now=10), 290)
+
+
+class TestParseBackends(unittest.TestCase):
+    def test_optional_service_names(self):
+        self.assertEqual(
+            parse_backends("https://a.run.app/twitter/user/, rsshub-2=https://b.run.app/twitter/user/"),
+            [("https://a.run.app/twitter/user/", "rsshub"), ("https://b.run.app/twitter/user/", "rsshub-2")]
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
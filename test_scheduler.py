@@ -0,0 +1,56 @@
+import random
+import unittest
+from scheduler import AdaptiveScheduler
+
+DAY = 24 * 60 * 60
+
+
+class TestAdaptiveScheduler(unittest.TestCase):
+    def make_scheduler(self):
+        return AdaptiveScheduler(rng=random.Random(1234))
+
+    def test_prolific_users_are_picked_more_often(self):
+        """Users that keep posting outrank users that never do"""
+        scheduler = self.make_scheduler()
+        now = 100 * DAY
+        for day in range(10):
+            scheduler.record_poll("busy", 1, now=now - (10 - day) * DAY)
+            scheduler.record_poll("quiet", 0, now=now - (10 - day) * DAY)
+
+        self.assertGreater(scheduler.posterior_rate("busy"), scheduler.posterior_rate("quiet"))
+        picks = [scheduler.select(["busy", "quiet"], 1, now=now)[0] for _ in range(200)]
+        self.assertGreater(picks.count("busy"), 150)
+
+    def test_yield_grows_with_time_since_last_check(self):
+        """The longer a user goes unchecked, the more likely a poll finds something"""
+        scheduler = self.make_scheduler()
+        scheduler.record_poll("bob", 1, now=0)
+        self.assertLess(scheduler.expected_yield("bob", now=60), scheduler.expected_yield("bob", now=DAY))
+
+    def test_old_observations_decay(self):
+        """Activity from long ago counts less than recent activity"""
+        scheduler = self.make_scheduler()
+        scheduler.record_poll("bob", 5, now=0)
+        stats = scheduler.record_poll("bob", 0, now=scheduler.half_life)
+        self.assertAlmostEqual(stats["events"], 2.5)
+
+    def test_seed_from_poll_stats(self):
+        """Users with only poll_stats totals get a starting rate, existing history wins"""
+        scheduler = self.make_scheduler()
+        scheduler.record_poll("bob", 1, now=0)
+        before = dict(scheduler.stats["bob"])
+        scheduler.seed("bob", 0, 10)
+        scheduler.seed("alice", 4, 4)
+        self.assertEqual(scheduler.stats["bob"], before)
+        self.assertEqual(scheduler.stats["alice"]["events"], 4.0)
+
+    def test_metrics_compare_selection_to_uniform(self):
+        scheduler = self.make_scheduler()
+        users = ["a", "b", "c"]
+        metrics = scheduler.metrics(users, selected=["a"], now=0)
+        self.assertEqual(metrics["users"], 3)
+        self.assertAlmostEqual(metrics["selected_expected_new"], metrics["uniform_expected_new"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+from settings import REQUIRED_ENV_VARS, Settings
+
+
+class TestSettings(unittest.TestCase):
+    def test_missing_variables_only_fail_when_required(self):
+        settings = Settings({"ANTHROPIC_API_KEY": "key", "RSSHUB_URL": ""})
+        self.assertEqual(settings["ANTHROPIC_API_KEY"], "key")
+        settings.require("ANTHROPIC_API_KEY")
+
+        self.assertEqual(settings.missing("RSSHUB_URL", "ANTHROPIC_API_KEY"), ["RSSHUB_URL"])
+        with self.assertRaises(SystemExit) as raised:
+            settings.require("TWITTER_API_KEY", "RSSHUB_URL")
+        self.assertIn("TWITTER_API_KEY, RSSHUB_URL", str(raised.exception))
+
+    def test_everything_required_by_default(self):
+        self.assertEqual(Settings({}).missing(), REQUIRED_ENV_VARS)
+        Settings({name: "x" for name in REQUIRED_ENV_VARS}).require()
+
+
+if __name__ == '__main__':
+    unittest.main()
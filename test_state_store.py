@@ -0,0 +1,150 @@
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from datetime import datetime, timedelta
+from state_store import StateStore, SqliteStateStore, atomic_write_json, seen_marks_from_tweets
+
+
+class TestStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "seen_tweets.json"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_loads_once_and_serves_from_memory(self):
+        """The file is read on first access only, later edits stay in memory"""
+        atomic_write_json(self.path, {"tweets": {"bob": {}}})
+        store = StateStore()
+        doc = store.document("seen", self.path, lambda: {"tweets": {}})
+
+        self.assertEqual(doc.data, {"tweets": {"bob": {}}})
+        doc.data["tweets"]["alice"] = {}
+        with open(self.path) as f:
+            self.assertNotIn("alice", json.load(f)["tweets"])
+
+    def test_rewrite_keeps_file_permissions(self):
+        """Atomic rewrites keep the file's mode instead of mkstemp's 0600"""
+        atomic_write_json(self.path, {})
+        os.chmod(self.path, 0o664)
+        atomic_write_json(self.path, {"tweets": {}})
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o664)
+
+    def test_flush_only_writes_dirty_documents(self):
+        """flush() writes dirty documents atomically and leaves no temp files"""
+        store = StateStore()
+        doc = store.document("seen", self.path, lambda: {"tweets": {}})
+        self.assertEqual(store.flush(), 0)
+        self.assertFalse(self.path.exists())
+
+        doc.data["tweets"]["bob"] = {"1": {"replied": False}}
+        doc.mark_dirty()
+        self.assertEqual(store.flush(), 1)
+        self.assertEqual(store.flush(), 0)
+
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"tweets": {"bob": {"1": {"replied": False}}}})
+        self.assertEqual(os.listdir(self.tmp.name), ["seen_tweets.json"])
+
+    def test_corrupt_file_falls_back_to_default(self):
+        """An unreadable file is treated like a missing one"""
+        self.path.write_text("{not json")
+        store = StateStore()
+        doc = store.document("seen", self.path, lambda: {"tweets": {}})
+        self.assertEqual(doc.data, {"tweets": {}})
+
+
+class TestSeenMarks(unittest.TestCase):
+    def test_marks_from_legacy_tweets(self):
+        """The highest tweet ID per user becomes its mark, replied IDs are kept too"""
+        marks = seen_marks_from_tweets({
+            "bob": {
+                "9": {"timestamp": "2025-05-16T14:00:00", "replied": True},
+                "100": {"timestamp": "2025-05-17T14:00:00", "replied": False}
+            },
+            "alice": {}
+        })
+        self.assertEqual(marks, {
+            "bob": {"last_id": "100", "timestamp": "2025-05-17T14:00:00", "last_replied_id": "9"}
+        })
+
+
+class TestSqliteStateStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = SqliteStateStore(Path(self.tmp.name) / "twitbot.db")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_seen_marks(self):
+        """A user's high-water mark only moves forward"""
+        self.assertIsNone(self.db.last_seen_id("bob"))
+        self.db.mark_tweet_as_seen("bob", "10", False, datetime.now().isoformat())
+        self.db.mark_tweet_as_seen("bob", "7", True, datetime.now().isoformat())
+        self.assertEqual(self.db.last_seen_id("bob"), 10)
+        self.assertIsNone(self.db.last_seen_id("alice"))
+
+    def test_compact_seen_marks(self):
+        """Compaction only drops expired marks of users that are no longer monitored"""
+        now = datetime.now()
+        old = (now - timedelta(days=40)).isoformat()
+        self.db.mark_tweet_as_seen("bob", "1", False, old)
+        self.db.mark_tweet_as_seen("alice", "2", False, old)
+        self.db.mark_tweet_as_seen("carol", "3", False, now.isoformat())
+
+        evicted, remaining = self.db.compact_seen_marks((now - timedelta(days=30)).isoformat(), {"alice"})
+        self.assertEqual((evicted, remaining), (1, 2))
+        self.assertIsNone(self.db.last_seen_id("bob"))
+        self.assertEqual(self.db.last_seen_id("alice"), 2)
+        self.assertEqual(self.db.last_seen_id("carol"), 3)
+
+    def test_recent_timestamps(self):
+        """Only replies newer than `since` are returned, as epoch seconds"""
+        now = datetime.now()
+        self.db.add_reply("1", (now - timedelta(hours=30)).isoformat())
+        self.db.add_reply("2", now.isoformat())
+        since = (now - timedelta(hours=24)).timestamp()
+        self.assertEqual(self.db.recent_timestamps("replies", since), [now.timestamp()])
+        self.assertEqual(self.db.recent_timestamps("polls", since), [])
+
+    def test_user_stats(self):
+        """Stats accumulate per user and keep the hit rate up to date"""
+        now = datetime.now()
+        self.db.update_user_stats("bob", 1, 1, now)
+        stats = self.db.update_user_stats("bob", 1, 0, now)
+        self.assertEqual(stats, {"total_polls": 2, "total_tweets": 2, "new_tweets": 1, "hit_rate": 0.5})
+
+    def test_migrate_from_json_runs_once(self):
+        """Legacy JSON files are imported on the first call only"""
+        now = datetime.now().isoformat()
+        tmp = Path(self.tmp.name)
+        atomic_write_json(tmp / "rate.json", {
+            "replies": [{"id": "2", "timestamp": now}],
+            "polls": [{"timestamp": now}],
+            "last_reset": now,
+            "monthly_replies": [{"id": "1", "timestamp": now}, {"id": "2", "timestamp": now}],
+            "last_monthly_reset": now
+        })
+        atomic_write_json(tmp / "seen.json", {"tweets": {"bob": {"2": {"timestamp": now, "replied": True}}}})
+        atomic_write_json(tmp / "stats.json", {
+            "user_stats": {"bob": {"total_polls": 4, "total_tweets": 4, "new_tweets": 1, "hit_rate": 0.25}},
+            "last_reset": now
+        })
+
+        self.assertTrue(self.db.migrate_from_json(tmp / "rate.json", tmp / "seen.json", tmp / "stats.json"))
+        self.assertFalse(self.db.migrate_from_json(tmp / "rate.json", tmp / "seen.json", tmp / "stats.json"))
+
+        self.assertEqual(self.db.last_seen_id("bob"), 2)
+        since = (datetime.now() - timedelta(days=1)).timestamp()
+        self.assertEqual(len(self.db.recent_timestamps("replies", since)), 2)
+        self.assertEqual(len(self.db.recent_timestamps("polls", since)), 1)
+        self.assertEqual(self.db.get_user_stats("bob")["hit_rate"], 0.25)
+
+
+if __name__ == '__main__':
+    unittest.main()